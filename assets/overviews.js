@@ -0,0 +1,210 @@
+/*
+ * Filters the overview plots of the physical wellness page in the browser.
+ *
+ * The "overview-figures" store holds every figure with the data of every
+ * day (see utils.create_overview_store), so picking a time window or
+ * zooming into a plot only slices that data here, without a round trip.
+ * Whatever is shown is downsampled to the same number of points as the
+ * server would send (see downsample.lttb).
+ */
+
+// Converts a plotly date (e.g., "2022-03-01", "2022-03-01 12:30" or
+// "2022-03-01T00:00:00") to milliseconds, reading every form as local time
+function toTime(value) {
+    if (typeof value === "number") {
+        return value;
+    }
+    let text = value.replace(" ", "T");
+    if (text.length === 10) {
+        text += "T00:00:00";
+    }
+    return Date.parse(text);
+}
+
+// The position of the first time at or after a limit
+function lowerBound(times, limit) {
+    let low = 0;
+    let high = times.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (times[middle] < limit) {
+            low = middle + 1;
+        } else {
+            high = middle;
+        }
+    }
+    return low;
+}
+
+// Picks the points that best preserve the shape of a series with the
+// Largest-Triangle-Three-Buckets algorithm (a port of downsample.lttb)
+function lttb(x, y, threshold) {
+    const n = x.length;
+    const picked = [];
+    if (threshold >= n || threshold < 3) {
+        for (let i = 0; i < n; i++) {
+            picked.push(i);
+        }
+        return picked;
+    }
+    const edges = [];
+    for (let i = 0; i < threshold - 1; i++) {
+        edges.push(Math.floor(1 + i * (n - 2) / (threshold - 2)));
+    }
+    picked.push(0);
+    let previous = 0;
+    for (let bucket = 0; bucket < threshold - 2; bucket++) {
+        // The average point of the next bucket, or the last point for the last bucket
+        let cx = x[n - 1];
+        let cy = y[n - 1];
+        if (bucket + 2 < edges.length) {
+            cx = 0;
+            cy = 0;
+            for (let i = edges[bucket + 1]; i < edges[bucket + 2]; i++) {
+                cx += x[i];
+                cy += y[i];
+            }
+            cx /= edges[bucket + 2] - edges[bucket + 1];
+            cy /= edges[bucket + 2] - edges[bucket + 1];
+        }
+        const ax = x[previous];
+        const ay = y[previous];
+        let largest = -1;
+        for (let i = edges[bucket]; i < edges[bucket + 1]; i++) {
+            const area = Math.abs((ax - cx) * (y[i] - ay) - (ax - x[i]) * (cy - ay));
+            if (area > largest) {
+                largest = area;
+                previous = i;
+            }
+        }
+        picked.push(previous);
+    }
+    picked.push(n - 1);
+    return picked;
+}
+
+// Reads the zoomed in x range out of a graph's relayoutData: null if the
+// graph was reset to its full range, or false if the x range did not change
+function parseRange(relayout) {
+    if (!relayout) {
+        return false;
+    }
+    if (relayout["xaxis.autorange"]) {
+        return null;
+    }
+    if ("xaxis.range[0]" in relayout && "xaxis.range[1]" in relayout) {
+        return [relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]];
+    }
+    if ("xaxis.range" in relayout) {
+        return relayout["xaxis.range"];
+    }
+    return false;
+}
+
+// The positions of the points of a date-sorted trace within [start, stop)
+function visibleRows(trace, start, stop) {
+    const times = trace.x.map(toTime);
+    const first = start === null ? 0 : lowerBound(times, start);
+    const last = stop === null ? times.length : lowerBound(times, stop);
+    return {times: times, first: first, last: last};
+}
+
+// Keeps the points of a trace within [start, stop), downsampled to at most
+// the given number of points, drawn with WebGL only when there are many
+function filterTrace(trace, start, stop, store) {
+    if (!Array.isArray(trace.x)) {
+        return trace;
+    }
+    const rows = visibleRows(trace, start, stop);
+    const y = trace.y.slice(rows.first, rows.last).map(value => Number(value) || 0);
+    const kept = lttb(rows.times.slice(rows.first, rows.last), y, store.points)
+        .map(i => rows.first + i);
+
+    const filtered = Object.assign({}, trace);
+    for (const key of ["x", "y", "customdata", "text", "hovertext"]) {
+        if (Array.isArray(trace[key]) && trace[key].length === trace.x.length) {
+            filtered[key] = kept.map(i => trace[key][i]);
+        }
+    }
+    if (trace.type === "scatter" || trace.type === "scattergl") {
+        filtered.type = kept.length > store.webgl ? "scattergl" : "scatter";
+    }
+    return filtered;
+}
+
+// The [start, stop) of a time window in milliseconds, either may be null.
+// Presets are looked up in the store; explicit "start/end" ranges (see
+// utils.window_bounds) are read directly, with the end day included.
+function windowRange(store, timeWindow) {
+    if (!(timeWindow in store.windows) && typeof timeWindow === "string" && timeWindow.includes("/")) {
+        const [start, end] = timeWindow.split("/");
+        let stop = null;
+        if (end) {
+            const day = new Date(toTime(end.slice(0, 10)));
+            day.setDate(day.getDate() + 1);
+            stop = day.getTime();
+        }
+        return [start ? toTime(start.slice(0, 10)) : null, stop];
+    }
+    const bounds = store.windows[timeWindow] || [null, null];
+    return bounds.map(bound => bound === null ? null : toTime(bound));
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    overviews: {
+        // Shows an overview plot for a time window, or for the part of it
+        // the user zoomed into, along with the trendline of the window
+        filterFigure: function (timeWindow, relayout, id, store) {
+            if (!store || !store.figures[id]) {
+                return window.dash_clientside.no_update;
+            }
+            const overview = store.figures[id];
+            let [start, stop] = windowRange(store, timeWindow);
+
+            // Only a zoom of this graph counts, not one left over from another window
+            const triggered = window.dash_clientside.callback_context.triggered
+                .map(trigger => trigger.prop_id);
+            let zoom = null;
+            if (triggered.includes(`${id}.relayoutData`)) {
+                zoom = parseRange(relayout);
+                if (zoom === false) {
+                    return window.dash_clientside.no_update;
+                }
+                if (zoom !== null) {
+                    start = toTime(zoom[0]);
+                    stop = toTime(zoom[1]);
+                }
+            }
+
+            const traces = overview.figure.data.slice();
+            if (overview.trends) {
+                // Explicit ranges show the part of the trendline of all time they cover
+                traces.push(overview.trends[timeWindow] || overview.trends["All Time"]);
+            }
+            const figure = {
+                data: traces.map(trace => filterTrace(trace, start, stop, store)),
+                // Keeps the user's zoom while the window stays the same
+                layout: Object.assign({}, overview.figure.layout, {uirevision: timeWindow})
+            };
+            if (zoom) {
+                figure.layout.xaxis = Object.assign({}, figure.layout.xaxis, {range: zoom});
+            }
+            return figure;
+        },
+
+        // Bins the values of another overview plot within a time window
+        filterHistogram: function (timeWindow, id, store) {
+            if (!store || !store.figures[id]) {
+                return window.dash_clientside.no_update;
+            }
+            const overview = store.figures[id];
+            const source = store.figures[overview.source].figure.data[0];
+            const [start, stop] = windowRange(store, timeWindow);
+            const rows = visibleRows(source, start, stop);
+            const histogram = Object.assign({}, overview.figure.data[0], {
+                x: source.y.slice(rows.first, rows.last)
+            });
+            return {data: [histogram], layout: overview.figure.layout};
+        }
+    }
+});
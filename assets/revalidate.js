@@ -0,0 +1,84 @@
+/*
+ * Keeps callback responses in the browser and revalidates them.
+ *
+ * Callbacks are POSTs, which the browser never caches, so every revisit
+ * would download the same figures again. Each response the server tags
+ * with an ETag (see responses.install) is kept in the Cache API, keyed by
+ * its request, and the next identical request sends the tag back. If the
+ * data has not changed, the server answers with a bodiless 304 and the
+ * kept response is used instead.
+ *
+ * The ETags depend on the build of the app and the day, so responses kept
+ * under an earlier build or day can never be reused. Each build and day
+ * gets its own cache, and the others are deleted on load.
+ */
+
+(function () {
+    const CACHE_PREFIX = "dash-callbacks";
+    const ENDPOINT = "_dash-update-component";
+    const originalFetch = window.fetch.bind(window);
+
+    // The Cache API and digests are only available to secure origins
+    if (!window.caches || !window.crypto || !window.crypto.subtle) {
+        return;
+    }
+
+    // Published by responses.install
+    const meta = document.querySelector('meta[name="dash-build"]');
+    if (!meta) {
+        return;
+    }
+    const today = new Date();
+    const day = [today.getFullYear(), today.getMonth() + 1, today.getDate()]
+        .map(part => String(part).padStart(2, "0"))
+        .join("-");
+    const CACHE_NAME = `${CACHE_PREFIX}-${meta.content}-${day}`;
+
+    window.caches.keys()
+        .then(names => Promise.all(names
+            .filter(name => name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME)
+            .map(name => window.caches.delete(name))))
+        .catch(() => {});
+
+    // Cache API keys are GET requests, so the body is folded into the URL as a digest
+    async function cacheKey(url, body) {
+        const digest = await window.crypto.subtle.digest("SHA-1", new TextEncoder().encode(body));
+        const hex = Array.from(new Uint8Array(digest))
+            .map(byte => byte.toString(16).padStart(2, "0"))
+            .join("");
+        return new Request(new URL(`${url}?request=${hex}`, window.location.href));
+    }
+
+    async function revalidate(url, init) {
+        let key, cache, kept;
+        try {
+            key = await cacheKey(url, init.body);
+            cache = await window.caches.open(CACHE_NAME);
+            kept = await cache.match(key);
+        } catch (error) {
+            // e.g., storage is disabled, so this request goes out as is
+            return originalFetch(url, init);
+        }
+        const headers = new Headers(init.headers || {});
+        if (kept && kept.headers.get("ETag")) {
+            headers.set("If-None-Match", kept.headers.get("ETag"));
+        }
+
+        const response = await originalFetch(url, Object.assign({}, init, {headers: headers}));
+        if (response.status === 304 && kept) {
+            return kept;
+        }
+        if (response.status === 200 && response.headers.get("ETag")) {
+            cache.put(key, response.clone()).catch(() => {});
+        }
+        return response;
+    }
+
+    window.fetch = function (resource, init) {
+        if (typeof resource !== "string" || !resource.endsWith(ENDPOINT) || !init
+                || init.method !== "POST" || typeof init.body !== "string") {
+            return originalFetch(resource, init);
+        }
+        return revalidate(resource, init);
+    };
+})();
@@ -0,0 +1,5 @@
+"""
+Offline benchmarks of the dashboard: a generator of synthetic datasets at
+any scale (benchmarks.synthetic) and a suite timing parsing, callbacks,
+plotting, and page assembly against a stored baseline (benchmarks.run).
+"""
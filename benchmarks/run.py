@@ -0,0 +1,356 @@
+"""
+Benchmarks of the dashboard on synthetic data.
+
+The synthetic datasets (see benchmarks.synthetic) are written to a
+temporary directory and the app is pointed at them, so nothing is
+downloaded. Each benchmark reports the median time of its runs and the
+peak memory traced during one more run, along with the size of what it
+serializes (e.g., a page's JSON).
+
+Data parsing and loading are measured cold. Everything else is measured
+the way a request sees it: the datasets and their derived values (group
+indexes, rollups, highlights) are built once up front, as the background
+refresher does, while the figure and trendline caches are cleared before
+every run so each run builds its figures.
+
+Results can be saved as a baseline, and later runs at the same scale are
+compared against it. A run fails if any benchmark got slower by more than
+the tolerance.
+
+    python -m benchmarks.run --years 10 --exercises 40
+    python -m benchmarks.run --save-baseline
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from plotly.io.json import to_json_plotly
+
+import cache
+import callbacks
+import constants
+import groups
+import layouts
+import pool
+import refresher
+import rollups
+import serialization
+import sources
+import trendlines
+import utils
+from benchmarks import synthetic
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """
+    A piece of work to time.
+
+    :param name: the name the results are reported (and compared) under
+    :param run: does the work, returning a payload (e.g., serialized JSON)
+        if its size should be reported too
+    :param setup: prepares each run without being timed
+    """
+    name: str
+    run: Callable[[], object]
+    setup: Optional[Callable[[], object]] = None
+
+
+def measure(benchmark: Benchmark, repeat: int) -> dict:
+    """
+    Times a benchmark and traces its peak memory.
+
+    :param benchmark: the benchmark
+    :param repeat: the number of timed runs
+    :return: the median seconds per run, the peak memory in MB, and the
+        size of the payload in bytes if the run returned one
+    """
+    setup = benchmark.setup or (lambda: None)
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        output = benchmark.run()
+        times.append(time.perf_counter() - start)
+
+    # Tracing slows everything down, so memory gets a run of its own
+    setup()
+    tracemalloc.start()
+    try:
+        benchmark.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {"seconds": statistics.median(times), "peak_mb": peak / 2**20}
+    if isinstance(output, (str, bytes)):
+        result["bytes"] = len(output)
+    return result
+
+
+def clear_caches():
+    cache.figure_cache.clear()
+    trendlines.trendline_cache.clear()
+
+
+def create_benchmarks(window: str = "All Time") -> list:
+    """
+    Creates a benchmark for parsing each dataset, every server callback,
+    every plotting helper of utils, and every page. Callbacks and plots
+    cover a single time window and the largest muscle group, the workout
+    day is the last one, and the page callback renders the physical page.
+
+    :param window: the time window of the callbacks and plots
+    :return: the benchmarks
+    """
+    today = datetime.date.today()
+    # The app is only imported for its page callback, without starting the background refresher
+    constants.DATA_REFRESH_INTERVAL = 0
+    import dashboard
+
+    benchmarks = []
+    for dataset in constants.DATA_SOURCES:
+        source = sources.get_source(dataset)
+        raw = source.fetch().frame
+        benchmarks += [
+            Benchmark(f"parse {dataset}", lambda source=source: source.fetch()),
+            Benchmark(f"prepare {dataset}", lambda dataset=dataset, raw=raw: utils.prepare_data(dataset, raw)),
+            Benchmark(
+                f"load {dataset}",
+                lambda dataset=dataset, source=source: cache.DatasetCache().get(
+                    source, lambda df: utils.prepare_data(dataset, df))
+            ),
+        ]
+
+    weightlifting = utils.load_dataset(constants.WEIGHTLIFTING)
+    fitbit = utils.load_dataset(constants.FITBIT)
+    for dataset, value in [(constants.WEIGHTLIFTING, weightlifting), (constants.FITBIT, fitbit)]:
+        for warm in refresher.WARMERS.get(dataset, []):
+            warm(value)
+
+    # Callbacks would otherwise keep prebuilding figures while later benchmarks run
+    prebuilder = pool.figure_pool
+    pool.figure_pool = pool.FigurePool("none")
+
+    df = weightlifting.frame
+    index = groups.get_group_index(weightlifting)
+    rows = utils.window_slice(df, window)
+    muscle = max(index.muscles(rows), key=lambda muscle: len(index.positions(muscle, rows=rows)))
+    exercise = index.exercises(muscle, rows)[0]
+    panels = [{"type": None, "muscle": name} for name in index.muscles(rows)]
+    contents = [None] * len(panels)
+
+    def panel_ids(panel: str) -> list:
+        return [{**ids, "type": panel} for ids in panels]
+
+    peaks, keep = trendlines.get_expanding_max(
+        weightlifting, rows, "Projected 1RM", ["Muscle Groups", "Exercise", "Per Arm"])
+    positions = index.positions(muscle, rows=rows)
+    positions = positions[keep[positions - rows.start]]
+    peaks_df = (
+        df[["Date", "Exercise", "Per Arm"]]
+        .take(positions)
+        .assign(**{"Projected 1RM": peaks[positions - rows.start]})
+        .dropna(subset=["Projected 1RM"])
+    )
+    volume_figure = utils.build_volume_figure(weightlifting, rows, window, muscle)
+    steps = fitbit.frame.iloc[utils.window_slice(fitbit.frame, window)]
+    exercise_groups = utils.time_filter(rollups.get_rollup(weightlifting, "daily_exercise"), window)
+    reps = weightlifting.derive("reps", lambda df: sorted(df["Reps"].dropna().unique()))
+    workouts = rollups.get_rollup(weightlifting, "daily_workouts")
+    workouts = workouts.iloc[utils.window_slice(workouts, window)]
+    workout_day = {"points": [{"customdata": workouts["Date"].iloc[-1].strftime("%Y-%m-%d")}]}
+
+    benchmarks += [
+        Benchmark(
+            "time_filter (every window)",
+            lambda: [utils.time_filter(df, name) for name in constants.TIME_WINDOWS]
+        ),
+        Benchmark(
+            "callback update_exercise_volume",
+            lambda: callbacks.update_exercise_volume(window, None)
+        ),
+        Benchmark(
+            "callback render_exercise_volume",
+            lambda: callbacks.render_exercise_volume(
+                muscle, window, panel_ids("exercise-volume-panel"), contents),
+            clear_caches
+        ),
+        Benchmark("callback update_1rm", lambda: callbacks.update_1rm(window, None)),
+        Benchmark(
+            "callback render_1rm",
+            lambda: callbacks.render_1rm(muscle, window, panel_ids("1rm-panel"), contents),
+            clear_caches
+        ),
+        Benchmark(
+            "callback update_exercise_sets_reps",
+            lambda: callbacks.update_exercise_sets_reps(window, None)
+        ),
+        Benchmark(
+            "callback render_exercise_sets_reps",
+            lambda: callbacks.render_exercise_sets_reps(
+                muscle, window, panel_ids("exercise-sets-reps-panel"), contents)
+        ),
+        Benchmark(
+            "callback render_exercise_sets_reps_tab",
+            lambda: callbacks.render_exercise_sets_reps_tab(
+                exercise, {"type": "exercise-sets-reps-tabs", "muscle": muscle}, window),
+            clear_caches
+        ),
+        Benchmark("callback update_calendar", lambda: callbacks.update_calendar(window), clear_caches),
+        Benchmark(
+            "callback render_workout_day",
+            lambda: to_json_plotly(callbacks.render_workout_day(workout_day))
+        ),
+        Benchmark(
+            "callback display_page",
+            lambda: to_json_plotly(dashboard.display_page("/physical-wellness")),
+            lambda: (clear_caches(), layouts._physical_layout.cache_clear())
+        ),
+        Benchmark(
+            "pool prebuild volume (every muscle)",
+            lambda: concurrent.futures.wait(prebuilder.prebuild(
+                "volume",
+                constants.WEIGHTLIFTING,
+                weightlifting,
+                [((window, rows.start, rows.stop, name), (rows, window, name)) for name in index.muscles(rows)]
+            )),
+            clear_caches
+        ),
+        Benchmark("serialize volume figure", lambda: serialization.to_json(volume_figure)),
+        Benchmark(
+            "utils plot_muscle_volume",
+            lambda: utils.plot_muscle_volume(
+                index.frame(df, muscle, rows=rows), index.exercises(muscle, rows), window),
+            clear_caches
+        ),
+        Benchmark(
+            "utils plot_muscle_1rm",
+            lambda: utils.plot_muscle_1rm(peaks_df, index.exercises(muscle, rows), window)
+        ),
+        Benchmark(
+            "utils plot_daily_overview",
+            lambda: utils.plot_daily_overview(exercise_groups, "Volume", "Volume (lbs)")
+        ),
+        Benchmark("utils plot_daily_points", lambda: utils.plot_daily_points(steps, "Steps")),
+        Benchmark("utils plot_daily_trend", lambda: utils.plot_daily_trend(steps, "Steps"), clear_caches),
+        Benchmark("utils create_overview_store", lambda: utils.create_overview_store(today), clear_caches),
+        Benchmark(
+            "utils plot_exercise_sets_reps",
+            lambda: utils.plot_exercise_sets_reps(index.frame(df, muscle, exercise, rows), reps)
+        ),
+        Benchmark(
+            "utils create_recent_exercises_table",
+            lambda: utils.create_recent_exercises_table(index.frame(df, muscle, exercise))
+        ),
+        Benchmark("utils plot_fatigue", lambda: utils.plot_fatigue(weightlifting, today)),
+        Benchmark(
+            "utils plot_calendar",
+            lambda: utils.plot_calendar(workouts, workouts["Date"].iloc[0], today)
+        ),
+        Benchmark(
+            "utils create_highlight_card",
+            lambda: utils.create_highlight_card("Steps", "steps / day", "Steps Highlights")
+        ),
+        # Pages are serialized too, since that is part of every page load
+        Benchmark("page home", lambda: to_json_plotly(layouts.home_layout)),
+        Benchmark(
+            "page physical",
+            lambda: to_json_plotly(layouts.physical_layout()),
+            lambda: (clear_caches(), layouts._physical_layout.cache_clear())
+        ),
+        Benchmark("page intellectual", lambda: to_json_plotly(layouts.intellectual_layout)),
+    ]
+    return benchmarks
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Prints the results next to a baseline.
+
+    :param results: the results of each benchmark, by name
+    :param baseline: the results of a previous run, by name
+    :param tolerance: how much slower (as a fraction) a benchmark may get
+    :return: the names of the benchmarks that got slower than that
+    """
+    regressions = []
+    print(f"{'benchmark':<42} {'time':>10} {'peak':>10} {'payload':>10} {'change':>8}")
+    for name, result in results.items():
+        payload = f"{result['bytes'] / 1024:>7.0f} KB" if "bytes" in result else " " * 10
+        line = f"{name:<42} {result['seconds'] * 1000:>7.1f} ms {result['peak_mb']:>7.1f} MB {payload}"
+        if name in baseline:
+            change = result["seconds"] / baseline[name]["seconds"] - 1
+            line += f" {change:>+8.0%}"
+            # Changes of less than a millisecond are noise however large they are relatively
+            if change > tolerance and result["seconds"] - baseline[name]["seconds"] > 0.001:
+                regressions.append(name)
+                line += "  SLOWER"
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the dashboard on synthetic data."
+    )
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--exercises", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="how much slower a benchmark may get before the run fails (default: 25%%)"
+    )
+    args = parser.parse_args(argv)
+    scale = {"years": args.years, "exercises": args.exercises, "seed": args.seed}
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Sources are only created on first use, so they can still be redirected
+        constants.DATA_SOURCES.update(
+            synthetic.write_datasets(directory, args.years, args.exercises, args.seed))
+        results = {
+            benchmark.name: measure(benchmark, args.repeat)
+            for benchmark in create_benchmarks()
+            if args.filter in benchmark.name
+        }
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            stored = json.load(file)
+        if stored["scale"] == scale:
+            baseline = stored["results"]
+        else:
+            print(f"The baseline was recorded at {stored['scale']}, so it is not compared against")
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        # Filtered runs only replace the benchmarks they ran
+        with open(args.baseline, "w") as file:
+            json.dump({"scale": scale, "results": {**baseline, **results}}, file, indent=2)
+            file.write("\n")
+        print(f"Saved the baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} benchmarks got more than {args.tolerance:.0%} slower")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+A deterministic generator of synthetic dashboard datasets.
+
+The generated CSVs have the same columns and quirks as the real ones (a
+row per exercise per workout, Fitbit days with missing weights and sleep)
+so they load through the regular sources, but their size is configurable
+to see how the dashboard scales with years of history and the number of
+exercises. The same seed and scale always produce the same values; only
+the dates move, so the history always ends on the given day.
+
+    python -m benchmarks.synthetic --years 50 --exercises 300 --output-dir data
+"""
+
+import argparse
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+import constants
+
+# Each workout trains a few muscle groups with a few of their exercises
+MUSCLES_PER_WORKOUT = 2
+EXERCISES_PER_MUSCLE = 3
+EXERCISES_PER_GROUP = 8
+
+
+def _dates(years: float, end: datetime.date) -> pd.DatetimeIndex:
+    return pd.date_range(end=pd.Timestamp(end), periods=max(int(years * 365.25), 1), freq="D")
+
+
+def generate_weightlifting(years: float, exercises: int, seed: int = 0, end: datetime.date = None) -> pd.DataFrame:
+    """
+    Generates a weightlifting log with a workout every other day.
+
+    :param years: the length of the history
+    :param exercises: the number of distinct exercises
+    :param seed: the seed of the random values
+    :param end: the date of the last workout (default: today)
+    :return: the log, as it would be read from its CSV
+    """
+    rng = np.random.default_rng(seed)
+    days = _dates(years, end or datetime.date.today())[::2]
+    muscles = np.arange(exercises) // EXERCISES_PER_GROUP
+    groups = muscles.max() + 1
+    base_weight = rng.integers(10, 200, exercises).astype(np.float64)
+    per_arm = rng.random(exercises) < 0.3
+
+    # The muscle groups and exercises of every workout, a row per exercise
+    trained = rng.integers(0, groups, (len(days), MUSCLES_PER_WORKOUT))
+    picks = rng.integers(0, EXERCISES_PER_GROUP, (len(days), MUSCLES_PER_WORKOUT, EXERCISES_PER_MUSCLE))
+    exercise = np.minimum(trained[:, :, None] * EXERCISES_PER_GROUP + picks, exercises - 1).reshape(-1)
+    day = np.repeat(np.arange(len(days)), MUSCLES_PER_WORKOUT * EXERCISES_PER_MUSCLE)
+    # Exercises of small groups collide, which the real log never repeats within a day
+    exercise, first = np.unique(day * exercises + exercise, return_index=True)
+    day, exercise = day[first], exercise % exercises
+
+    rows = len(day)
+    progress = 1 + 0.5 * day / max(len(days) - 1, 1)
+    reps = rng.integers(3, 16, rows)
+    sets = rng.integers(1, 5, rows)
+    return pd.DataFrame({
+        "Date": days[day].strftime("%Y-%m-%d"),
+        "Muscle Groups": [f"Muscle Group {muscle + 1}" for muscle in muscles[exercise]],
+        "Exercise": [f"Exercise {index + 1}" for index in exercise],
+        "Weight": np.round(base_weight[exercise] * progress * rng.normal(1, 0.05, rows) * 2) / 2,
+        "Reps": reps,
+        "Sets": sets,
+        "Total Reps": reps * sets,
+        "Per Arm": per_arm[exercise],
+        "Difficulty": rng.integers(1, 5, rows),
+    })
+
+
+def generate_fitbit(years: float, seed: int = 0, end: datetime.date = None) -> pd.DataFrame:
+    """
+    Generates a daily Fitbit export. Weight is only logged on about half
+    of the days and sleep is missing on about a tenth of them.
+
+    :param years: the length of the history
+    :param seed: the seed of the random values
+    :param end: the last day (default: today)
+    :return: the export, as it would be read from its CSV
+    """
+    rng = np.random.default_rng(seed + 1)
+    days = _dates(years, end or datetime.date.today())
+    count = len(days)
+    weight = 180 + np.cumsum(rng.normal(0, 0.2, count)) + rng.normal(0, 1, count)
+    return pd.DataFrame({
+        "Date": days.strftime("%Y-%m-%d"),
+        "Steps": rng.integers(1000, 25000, count),
+        "Weight": np.where(rng.random(count) < 0.5, np.nan, weight.round(1)),
+        "Total Sleep (minutes)": np.where(rng.random(count) < 0.1, np.nan, rng.normal(420, 45, count).round(3)),
+        "Resting Heart Rate": rng.normal(60, 4, count).round(3),
+    })
+
+
+def write_datasets(directory: str, years: float, exercises: int, seed: int = 0, end: datetime.date = None) -> dict:
+    """
+    Writes both synthetic datasets as CSVs.
+
+    :param directory: where to write them
+    :param years: the length of the history
+    :param exercises: the number of distinct exercises
+    :param seed: the seed of the random values
+    :param end: the last day of both datasets (default: today)
+    :return: the path of each dataset, keyed like constants.DATA_SOURCES
+    """
+    os.makedirs(directory, exist_ok=True)
+    frames = {
+        constants.WEIGHTLIFTING: generate_weightlifting(years, exercises, seed, end),
+        constants.FITBIT: generate_fitbit(years, seed, end),
+    }
+    paths = {}
+    for dataset, frame in frames.items():
+        paths[dataset] = os.path.join(directory, f"{dataset}.csv")
+        frame.to_csv(paths[dataset], index=False)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generates synthetic dashboard datasets."
+    )
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--exercises", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--output-dir", default="synthetic")
+    args = parser.parse_args(argv)
+
+    paths = write_datasets(args.output_dir, args.years, args.exercises, args.seed, args.end)
+    for dataset, path in paths.items():
+        print(f"Wrote {dataset} to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import pandas as pd
+import plotly.graph_objects as go
+
+import constants
+import metrics
+import serialization
+from datasets import Dataset
+from sources import DataSource, Payload, Watermark
+
+
+@dataclass
+class CacheEntry:
+    """
+    A prepared dataset along with the validators needed to revalidate it
+    and, for append-only sources, where the last read stopped and when
+    (and with which validators) the source was last read in full.
+    """
+    value: Dataset
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    watermark: Optional[Watermark] = None
+    last_date: Optional[pd.Timestamp] = None
+    loaded_at: float = 0.0
+    full_etag: Optional[str] = None
+    full_last_modified: Optional[str] = None
+
+
+class _Flight:
+    """
+    A single in-progress fetch that other threads can wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class DatasetCache:
+    """
+    A thread-safe cache of prepared, versioned datasets keyed by source location.
+
+    Entries are served from memory until they are older than the TTL. After
+    that, the source is revalidated with its validators (ETag and
+    Last-Modified), so an unchanged file costs a 304 rather than a download
+    and a parse. Concurrent requests for the same source share a single fetch.
+
+    In incremental mode, a changed append-only source is refreshed by
+    reading and preparing only the rows past the previous watermark. If
+    the source was rewritten rather than appended to, or the new rows are
+    dated before the existing ones, the dataset is reloaded in full. So is
+    one that has only been refreshed incrementally for longer than the
+    full reload interval, in case a row before the watermark was edited
+    in a way the source cannot detect. That reload is conditional on the
+    validators of the last full read, so a source that has not changed
+    since costs a 304, and one that has is reloaded under its old version
+    if its rows turn out to be the same.
+
+    Cached values are shared between callers, so they must not be mutated.
+
+    :param ttl: the number of seconds an entry is considered fresh
+    :param incremental: whether to read only appended rows on refresh
+    :param full_reload_interval: the number of seconds after which an
+        incremental refresh reads the source in full instead
+    """
+
+    def __init__(
+            self,
+            ttl: float = constants.DATA_CACHE_TTL,
+            incremental: bool = constants.DATA_INCREMENTAL,
+            full_reload_interval: float = constants.DATA_FULL_RELOAD_INTERVAL
+    ):
+        self.ttl = ttl
+        self.incremental = incremental
+        self.full_reload_interval = full_reload_interval
+        self._entries: dict = {}
+        self._flights: dict = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "not_modified": 0,
+            "appends": 0,
+            "reloads": 0
+        }
+
+    def get(self, source: DataSource, prepare: Callable[[pd.DataFrame], pd.DataFrame], max_age: Optional[float] = None) -> Dataset:
+        """
+        Retrieves the prepared dataset for a source, fetching it only if needed.
+
+        :param source: the source of the dataset
+        :param prepare: a function adding the derived columns to raw rows
+        :param max_age: overrides the TTL (e.g., 0 to always revalidate)
+        :return: the prepared dataset
+        """
+        location = source.location
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(location)
+            if entry is not None and time.monotonic() - entry.fetched_at < max_age:
+                self._stats["hits"] += 1
+                return entry.value
+            flight = self._flights.get(location)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[location] = flight
+                self._stats["misses" if entry is None else "refreshes"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._load(source, entry, prepare)
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[location]
+            flight.done.set()
+        return flight.value
+
+    def _load(self, source: DataSource, entry: Optional[CacheEntry], prepare: Callable[[pd.DataFrame], pd.DataFrame]):
+        """
+        Fetches a source, reusing the existing entry if it reports no change.
+        """
+        full_check = False
+        if entry is None:
+            payload = source.fetch()
+        elif self.incremental and entry.watermark is not None:
+            if time.monotonic() - entry.loaded_at < self.full_reload_interval:
+                payload = source.fetch_tail(entry.etag, entry.last_modified, entry.watermark)
+            else:
+                # Tail reads cannot vouch for earlier rows, so this uses the validators of the last full read
+                full_check = True
+                payload = source.fetch(entry.full_etag, entry.full_last_modified)
+        else:
+            payload = source.fetch(entry.etag, entry.last_modified)
+        if payload is None:
+            with self._lock:
+                self._stats["not_modified"] += 1
+                entry.fetched_at = time.monotonic()
+                if full_check:
+                    entry.loaded_at = entry.fetched_at
+            return entry.value
+
+        value = None
+        loaded_at = entry.loaded_at if entry is not None else None
+        if payload.appended:
+            value, last_date = self._append(entry, payload, prepare)
+            if value is None:
+                payload = source.fetch()
+        if value is None:
+            value = Dataset(prepare(payload.frame))
+            if entry is not None and value.version == entry.value.version:
+                # The same rows, so values derived from them are kept
+                value = entry.value
+            last_date = value.frame["Date"].max() if len(value) else None
+            loaded_at = None
+            if entry is not None:
+                with self._lock:
+                    self._stats["reloads"] += 1
+
+        now = time.monotonic()
+        if loaded_at is None:
+            full_validators = payload.etag, payload.last_modified
+        else:
+            full_validators = entry.full_etag, entry.full_last_modified
+        with self._lock:
+            self._entries[source.location] = CacheEntry(
+                value,
+                payload.etag,
+                payload.last_modified,
+                now,
+                payload.watermark,
+                last_date,
+                now if loaded_at is None else loaded_at,
+                *full_validators
+            )
+        return value
+
+    def _append(self, entry: CacheEntry, payload: Payload, prepare: Callable[[pd.DataFrame], pd.DataFrame]):
+        """
+        Prepares just the appended rows and adds them to the cached dataset.
+
+        :return: the combined dataset and its latest date, or (None, None)
+            if the new rows are dated before the existing ones
+        """
+        drop = entry.watermark.trailing_rows
+        if payload.frame.empty:
+            rows, last_date = None, entry.last_date
+        else:
+            rows = prepare(payload.frame)
+            last_date = entry.last_date
+            if last_date is not None and rows["Date"].min() < last_date:
+                return None, None
+            last_date = rows["Date"].max() if last_date is None else max(last_date, rows["Date"].max())
+
+        with self._lock:
+            self._stats["appends"] += 1
+        if rows is None:
+            rows = entry.value.frame.iloc[:0]
+            if not drop:
+                return entry.value, last_date
+        return entry.value.extend(rows, drop), last_date
+
+    def invalidate(self, location: Optional[str] = None):
+        """
+        Drops a single entry, or every entry if no location is given.
+
+        :param location: the location of the dataset to drop
+        """
+        with self._lock:
+            if location is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(location, None)
+
+    def stats(self) -> dict:
+        """
+        Reports the hit, miss, refresh, not modified, append, and reload counters.
+
+        :return: a copy of the counters
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+dataset_cache = DatasetCache()
+
+
+class FigureCache:
+    """
+    A thread-safe LRU cache of serialized figures with a memory budget.
+
+    Figures are keyed by their kind, the parameters they were built from,
+    and the version (content hash) of the data behind them, and are stored
+    as compacted JSON (see serialization.compact_figure). A hit is served by parsing that JSON, without touching pandas
+    or plotly. The least recently used figures are evicted once the stored
+    JSON exceeds the budget.
+
+    :param budget: the maximum number of bytes of JSON to keep
+    """
+
+    def __init__(self, budget: int = constants.FIGURE_CACHE_BYTES):
+        self.budget = budget
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, kind: str, params: tuple, version: str, build: Callable[[], go.Figure]) -> dict:
+        """
+        Retrieves a figure, building and serializing it only on a miss.
+        Concurrent requests for a figure that is being built (e.g., by the
+        figure pool) wait for that build rather than repeating it.
+
+        :param kind: the kind of figure (e.g., "steps")
+        :param params: everything besides the data the figure depends on
+        :param version: the version of the data the figure is built from
+        :param build: creates the figure, or its JSON if it was serialized
+            elsewhere (e.g., by a worker process)
+        :return: the figure as a plain dictionary
+        """
+        key = (kind, params, version)
+        while True:
+            with self._lock:
+                serialized = self._entries.get(key)
+                flight = self._flights.get(key)
+                if serialized is not None:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                elif flight is None:
+                    self._flights[key] = threading.Event()
+                    self._stats["misses"] += 1
+            if serialized is not None or flight is None:
+                break
+            # If the other build failed or was too big to keep, build it here instead
+            flight.wait()
+        metrics.count("figure_cache_miss" if serialized is None else "figure_cache_hit")
+        if serialized is None:
+            try:
+                figure = build()
+                with metrics.stage("serialize"):
+                    serialized = figure if isinstance(figure, str) else serialization.to_json(figure)
+                self._put(key, serialized)
+            finally:
+                with self._lock:
+                    self._flights.pop(key).set()
+        with metrics.stage("serialize"):
+            return serialization.loads(serialized)
+
+    def contains(self, kind: str, params: tuple, version: str) -> bool:
+        """
+        Checks whether a figure is cached or being built, without counting
+        it as a hit.
+
+        :param kind: the kind of figure (e.g., "steps")
+        :param params: everything besides the data the figure depends on
+        :param version: the version of the data the figure is built from
+        """
+        key = (kind, params, version)
+        with self._lock:
+            return key in self._entries or key in self._flights
+
+    def _put(self, key: tuple, serialized: str):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            if len(serialized) > self.budget:
+                return
+            self._entries[key] = serialized
+            self._size += len(serialized)
+            while self._size > self.budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        """
+        Drops every figure.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        """
+        Reports the hit, miss, and eviction counters along with the hit
+        rate and the current size of the cache.
+
+        :return: a copy of the counters
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+figure_cache = FigureCache()
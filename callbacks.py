@@ -1,190 +1,244 @@
 import dash_bootstrap_components as dbc
-import plotly.express as px
-from dash import Input, Output, callback, dcc, html
+from dash import (
+    ALL, MATCH, ClientsideFunction, Input, Output, State, callback, clientside_callback, ctx, dcc, html, no_update
+)
+from dash.exceptions import PreventUpdate
 
+import cache
 import constants
+import groups
+import metrics
+import pool
 import utils
 
 
+@callback(
+    Output("dropdown", "options"),
+    Output("dropdown", "value"),
+    Output("date-range", "start_date"),
+    Output("date-range", "end_date"),
+    Input("dropdown", "value"),
+    Input("date-range", "start_date"),
+    Input("date-range", "end_date"),
+    prevent_initial_call=True
+)
+@metrics.instrument_callback
+def select_time_window(dropdown_value, start_date, end_date):
+    """
+    Keeps the time window dropdown and the date range picker in sync. A
+    picked range becomes the dropdown's value as an explicit
+    "start/end" window (see utils.window_bounds), which every callback
+    of the time window then follows; picking a preset clears the range.
+    """
+    if ctx.triggered_id == "date-range":
+        if not start_date and not end_date:
+            return constants.TIME_WINDOWS, "All Time", no_update, no_update
+        window = f"{start_date or ''}/{end_date or ''}"
+        option = {"label": utils.describe_window(window), "value": window}
+        return [*constants.TIME_WINDOWS, option], window, no_update, no_update
+    if dropdown_value in constants.TIME_WINDOWS:
+        return constants.TIME_WINDOWS, no_update, None, None
+    raise PreventUpdate
+
+
 @callback(
     Output("exercise-volume-over-time", "children"),
-    Input("dropdown", "value")
+    Output("exercise-volume-over-time", "active_item"),
+    Input("dropdown", "value"),
+    State("exercise-volume-over-time", "active_item")
+)
+@metrics.instrument_callback
+def update_exercise_volume(dropdown_value, active_item):
+    dataset = utils.load_dataset(constants.WEIGHTLIFTING)
+    window_context = utils.get_window_context(dataset, dropdown_value)
+    rows, muscles = window_context.rows, window_context.muscles
+    pool.figure_pool.prebuild("volume", constants.WEIGHTLIFTING, dataset, [
+        ((dropdown_value, rows.start, rows.stop, muscle), (rows, dropdown_value, muscle))
+        for muscle in muscles
+    ])
+    return utils.create_lazy_accordion("exercise-volume-panel", muscles, active_item)
+
+
+@callback(
+    Output({"type": "exercise-volume-panel", "muscle": ALL}, "children"),
+    Input("exercise-volume-over-time", "active_item"),
+    State("dropdown", "value"),
+    State({"type": "exercise-volume-panel", "muscle": ALL}, "id"),
+    State({"type": "exercise-volume-panel", "muscle": ALL}, "children")
 )
-def update_exercise_volume(dropdown_value):
-    items = []
-    df = utils.load_data(constants.WEIGHTLIFTING_URL)
-    curr = utils.time_filter(df, dropdown_value)
-    for muscle in sorted(curr["Muscle Groups"].unique()):
-        children = []
-        children.append(html.H3(muscle))
-        curr_muscle = curr[curr["Muscle Groups"] == muscle]
-        display_order = {"Exercise": sorted(curr_muscle["Exercise"].unique())}
-        figure = px.scatter(
-            curr_muscle,
-            x="Date",
-            y="Volume",
-            color="Exercise",
-            title=f"Lift Volume by Muscle Group: {dropdown_value}",
-            category_orders=display_order,
-            symbol="Per Arm",
-            trendline="lowess"
+@metrics.instrument_callback
+def render_exercise_volume(active_item, dropdown_value, panels, contents):
+    dataset = utils.load_dataset(constants.WEIGHTLIFTING)
+    rows = utils.get_window_context(dataset, dropdown_value).rows
+
+    def render(muscle):
+        figure = cache.figure_cache.get(
+            "volume",
+            (dropdown_value, rows.start, rows.stop, muscle),
+            dataset.version,
+            lambda: utils.build_volume_figure(dataset, rows, dropdown_value, muscle)
         )
-        figure.data = [t for t in figure.data if t.mode == "lines"]
-        figure.update_traces(showlegend=True)
-        children.append(dcc.Graph(figure=figure))
-        items.append(dbc.AccordionItem(children, title=muscle))
-    return items
+        return [html.H3(muscle), dcc.Graph(figure=figure)]
+
+    return utils.render_lazy_panels(active_item, panels, contents, render)
 
 
 @callback(
     Output("1rm-over-time", "children"),
-    Input("dropdown", "value")
+    Output("1rm-over-time", "active_item"),
+    Input("dropdown", "value"),
+    State("1rm-over-time", "active_item")
 )
-def update_1rm(dropdown_value):
-    items = []
-    df = utils.load_data(constants.WEIGHTLIFTING_URL)
-    curr = utils.time_filter(df, dropdown_value)
-    for muscle in sorted(curr["Muscle Groups"].unique()):
-        children = []
-        children.append(html.H3(muscle))
-        curr_muscle = curr[curr["Muscle Groups"] == muscle]
-        display_order = {"Exercise": sorted(curr_muscle["Exercise"].unique())}
-        figure = px.scatter(
-            curr_muscle,
-            x="Date",
-            y="Projected 1RM",
-            color="Exercise",
-            title=f"Projected 1RM by Muscle Group: {dropdown_value}",
-            category_orders=display_order,
-            symbol="Per Arm",
-            trendline="expanding",
-            trendline_options=dict(function="max")
+@metrics.instrument_callback
+def update_1rm(dropdown_value, active_item):
+    dataset = utils.load_dataset(constants.WEIGHTLIFTING)
+    window_context = utils.get_window_context(dataset, dropdown_value)
+    rows, muscles = window_context.rows, window_context.muscles
+    pool.figure_pool.prebuild("1rm", constants.WEIGHTLIFTING, dataset, [
+        ((dropdown_value, rows.start, rows.stop, muscle), (rows, dropdown_value, muscle))
+        for muscle in muscles
+    ])
+    return utils.create_lazy_accordion("1rm-panel", muscles, active_item)
+
+
+@callback(
+    Output({"type": "1rm-panel", "muscle": ALL}, "children"),
+    Input("1rm-over-time", "active_item"),
+    State("dropdown", "value"),
+    State({"type": "1rm-panel", "muscle": ALL}, "id"),
+    State({"type": "1rm-panel", "muscle": ALL}, "children")
+)
+@metrics.instrument_callback
+def render_1rm(active_item, dropdown_value, panels, contents):
+    dataset = utils.load_dataset(constants.WEIGHTLIFTING)
+    rows = utils.get_window_context(dataset, dropdown_value).rows
+
+    def render(muscle):
+        figure = cache.figure_cache.get(
+            "1rm",
+            (dropdown_value, rows.start, rows.stop, muscle),
+            dataset.version,
+            lambda: utils.build_1rm_figure(dataset, rows, dropdown_value, muscle)
         )
-        figure.data = [t for t in figure.data if t.mode == "lines"]
-        figure.update_traces(showlegend=True)
-        children.append(dcc.Graph(figure=figure))
-        items.append(dbc.AccordionItem(children, title=muscle))
-    return items
+        return [html.H3(muscle), dcc.Graph(figure=figure)]
+
+    return utils.render_lazy_panels(active_item, panels, contents, render)
 
 
 @callback(
     Output("exercise-sets-reps", "children"),
-    Input("dropdown", "value")
+    Output("exercise-sets-reps", "active_item"),
+    Input("dropdown", "value"),
+    State("exercise-sets-reps", "active_item")
 )
-def update_exercise_sets_reps(dropdown_value):
-    items = []
-    df = utils.load_data(constants.WEIGHTLIFTING_URL)
-    curr = utils.time_filter(df, dropdown_value)
-    for muscle in sorted(curr["Muscle Groups"].unique()):
-        children = []
-        tabs = []
-        children.append(html.H3(muscle))
-        children.append(html.P(constants.workout_constants.get(
-            muscle, {}).get("description", "")))
-        curr_muscle = curr[curr["Muscle Groups"] == muscle]
-        for exercise in sorted(curr_muscle["Exercise"].unique()):
-            tab_children = []
-            tab_children.append(html.H4(exercise))
-            exercise_constants = constants.workout_constants.get(exercise, {})
-            tab_children.append(
-                utils.create_video_description_row(exercise_constants))
-            figure = utils.plot_exercise_sets_reps(
-                df,
-                dropdown_value,
-                muscle,
-                exercise
-            )
-            tab_children.append(
-                utils.create_recent_exercises_table(df, muscle, exercise))
-            tab_children.append(dcc.Graph(figure=figure))
-            tabs.append(dbc.Tab(tab_children, label=exercise))
-        children.append(dbc.Tabs(tabs))
-        items.append(dbc.AccordionItem(children=children, title=muscle))
-    return items
+@metrics.instrument_callback
+def update_exercise_sets_reps(dropdown_value, active_item):
+    dataset = utils.load_dataset(constants.WEIGHTLIFTING)
+    window_context = utils.get_window_context(dataset, dropdown_value)
+    return utils.create_lazy_accordion("exercise-sets-reps-panel", window_context.muscles, active_item)
 
 
 @callback(
-    Output("projected-1rm-overview", "figure"),
-    Output("volume-overview", "figure"),
-    Input("dropdown", "value")
+    Output({"type": "exercise-sets-reps-panel", "muscle": ALL}, "children"),
+    Input("exercise-sets-reps", "active_item"),
+    State("dropdown", "value"),
+    State({"type": "exercise-sets-reps-panel", "muscle": ALL}, "id"),
+    State({"type": "exercise-sets-reps-panel", "muscle": ALL}, "children")
 )
-def homepage_overview_plots(dropdown_value):
-    df = utils.load_data(constants.WEIGHTLIFTING_URL)
-    df = utils.time_filter(df, dropdown_value)
-    exercise_groups = df.groupby(["Date", "Exercise"]).agg(
-        {"Volume": "sum", "Projected 1RM": "max"}).reset_index()
-    fig1 = px.scatter(
-        exercise_groups,
-        x="Date",
-        y="Volume",
-        color="Exercise",
-        labels={"Volume": "Volume (lbs)"}
-    )
-    fig2 = px.scatter(
-        exercise_groups,
-        x="Date",
-        y="Projected 1RM",
-        color="Exercise",
-        labels={"Projected 1RM": "Maximum Projected 1RM (lbs)"}
-    )
-    return fig2, fig1
+@metrics.instrument_callback
+def render_exercise_sets_reps(active_item, dropdown_value, panels, contents):
+    dataset = utils.load_dataset(constants.WEIGHTLIFTING)
+    window_context = utils.get_window_context(dataset, dropdown_value)
+    rows = window_context.rows
+
+    def render(muscle):
+        exercises = window_context.exercises(muscle)
+        # Every tab of the panel is built ahead of time, so switching tabs is instant
+        pool.figure_pool.prebuild("sets_reps", constants.WEIGHTLIFTING, dataset, [
+            ((rows.start, rows.stop, muscle, exercise), (rows, muscle, exercise))
+            for exercise in exercises
+        ])
+        return [
+            html.H3(muscle),
+            html.P(constants.workout_constants.get(muscle, {}).get("description", "")),
+            dbc.Tabs(
+                [dbc.Tab(label=exercise, tab_id=exercise) for exercise in exercises],
+                id={"type": "exercise-sets-reps-tabs", "muscle": muscle},
+                active_tab=exercises[0] if exercises else None
+            ),
+            html.Div(id={"type": "exercise-sets-reps-tab", "muscle": muscle})
+        ]
+
+    return utils.render_lazy_panels(active_item, panels, contents, render)
 
 
 @callback(
-    Output("steps-overview", "figure"),
-    Input("dropdown", "value")
+    Output({"type": "exercise-sets-reps-tab", "muscle": MATCH}, "children"),
+    Input({"type": "exercise-sets-reps-tabs", "muscle": MATCH}, "active_tab"),
+    State({"type": "exercise-sets-reps-tabs", "muscle": MATCH}, "id"),
+    State("dropdown", "value")
 )
-def steps_overview_plot(dropdown_value):
-    df = utils.load_data(constants.FITBIT_URL)
-    df = utils.time_filter(df, dropdown_value)
-    fig = px.scatter(
-        df,
-        x="Date",
-        y="Steps",
-        trendline="lowess", 
-        trendline_options=dict(frac=0.05),
-        trendline_color_override=px.colors.qualitative.G10[8]
+@metrics.instrument_callback
+def render_exercise_sets_reps_tab(exercise, tabs, dropdown_value):
+    if exercise is None:
+        raise PreventUpdate
+    muscle = tabs["muscle"]
+    dataset = utils.load_dataset(constants.WEIGHTLIFTING)
+    df = dataset.frame
+    index = groups.get_group_index(dataset)
+    rows = utils.get_window_context(dataset, dropdown_value).rows
+    figure = cache.figure_cache.get(
+        "sets_reps",
+        (rows.start, rows.stop, muscle, exercise),
+        dataset.version,
+        lambda: utils.build_sets_reps_figure(dataset, rows, muscle, exercise)
     )
-    return fig
+    return [
+        html.H4(exercise),
+        utils.create_video_description_row(constants.workout_constants.get(exercise, {})),
+        utils.create_recent_exercises_table(index.frame(df, muscle, exercise)),
+        dcc.Graph(figure=figure)
+    ]
+
 
 @callback(
-    Output("weight-overview", "figure"),
-    Output("weight-histogram", "figure"),
+    Output("workout-calendar", "figure"),
     Input("dropdown", "value")
 )
-def weight_overview_plot(dropdown_value):
-    df = utils.load_data(constants.FITBIT_URL)
-    df = utils.time_filter(df, dropdown_value)
-    df = df.dropna(subset=["Weight"])
-    overview = px.scatter(
-        df,
-        x="Date",
-        y="Weight",
-        trendline="lowess", 
-        trendline_options=dict(frac=0.05),
-        trendline_color_override=px.colors.qualitative.G10[8]
-    )
-    histogram = px.histogram(
-        df,
-        x="Weight"
-    )
-    return overview, histogram 
+@metrics.instrument_callback
+def update_calendar(dropdown_value):
+    return utils.create_calendar_plot(dropdown_value)
+
 
 @callback(
-    Output("sleep-overview", "figure"),
-    Input("dropdown", "value")
+    Output("workout-day", "children"),
+    Input("workout-calendar", "clickData")
 )
-def sleep_overview_plot(dropdown_value):
-    df = utils.load_data(constants.FITBIT_URL)
-    df = utils.time_filter(df, dropdown_value)
-    df = df.dropna(subset=["Total Sleep (hours)"])
-    fig = px.scatter(
-        df,
-        x="Date",
-        y="Total Sleep (hours)",
-        trendline="lowess", 
-        trendline_options=dict(frac=0.05),
-        trendline_color_override=px.colors.qualitative.G10[8],
-        hover_data=["Sleep (readable)"],
+@metrics.instrument_callback
+def render_workout_day(click_data):
+    day = (click_data or {}).get("points", [{}])[0].get("customdata")
+    if not day:
+        raise PreventUpdate
+    df = utils.load_dataset(constants.WEIGHTLIFTING).frame
+    return utils.create_workout_day_table(df.iloc[utils.window_slice(df, f"{day}/{day}")], day)
+
+
+# Overview plots are filtered to the time window (and zoomed into) by the
+# browser from the "overview-figures" store (see utils.create_overview_store)
+for graph in ["volume-overview", "projected-1rm-overview", "steps-overview", "weight-overview", "sleep-overview"]:
+    clientside_callback(
+        ClientsideFunction("overviews", "filterFigure"),
+        Output(graph, "figure"),
+        Input("dropdown", "value"),
+        Input(graph, "relayoutData"),
+        State(graph, "id"),
+        State("overview-figures", "data")
     )
-    return fig
+
+clientside_callback(
+    ClientsideFunction("overviews", "filterHistogram"),
+    Output("weight-histogram", "figure"),
+    Input("dropdown", "value"),
+    State("weight-histogram", "id"),
+    State("overview-figures", "data")
+)
@@ -1,3 +1,5 @@
+import os
+
 workout_constants = {
     "Back": {
         "description":
@@ -26,3 +28,65 @@ workout_constants = {
 
 WEIGHTLIFTING_URL = "https://raw.githubusercontent.com/jrg94/personal-data/main/health/weightlifting.csv"
 FITBIT_URL = "https://raw.githubusercontent.com/jrg94/personal-data/main/health/fitbit.csv"
+
+# The time windows offered by the navbar dropdown (see utils.window_bounds)
+TIME_WINDOWS = [
+    "All Time",
+    "Year to Date",
+    "Last 30 Days",
+    "Last 12 Weeks",
+    "Last Three Months",
+    "Last Six Months",
+    "Last Year",
+    "Last Two Years",
+]
+
+WEIGHTLIFTING = "weightlifting"
+FITBIT = "fitbit"
+
+# Where each dataset is read from: a URL, a local CSV, or a local snapshot (.feather, .arrow, .parquet)
+DATA_SOURCES = {
+    WEIGHTLIFTING: os.environ.get("WEIGHTLIFTING_SOURCE", WEIGHTLIFTING_URL),
+    FITBIT: os.environ.get("FITBIT_SOURCE", FITBIT_URL),
+}
+
+# Seconds a downloaded dataset is served from memory before it is revalidated
+DATA_CACHE_TTL = float(os.environ.get("DATA_CACHE_TTL", 300))
+DATA_FETCH_TIMEOUT = float(os.environ.get("DATA_FETCH_TIMEOUT", 30))
+# Seconds between background refreshes of every dataset (0 fetches on request instead)
+DATA_REFRESH_INTERVAL = float(os.environ.get("DATA_REFRESH_INTERVAL", DATA_CACHE_TTL))
+# Where workers share prepared datasets through memory-mapped files, ideally on
+# tmpfs (e.g., /dev/shm/health-dashboard); unset, each worker keeps its own copy
+SHARED_DATA_DIR = os.environ.get("SHARED_DATA_DIR", "")
+# How many versions of each dataset the shared store keeps, so workers that
+# just read the pointer to an older one can still map it
+SHARED_DATA_VERSIONS = int(os.environ.get("SHARED_DATA_VERSIONS", 3))
+# Whether refreshes of the append-only CSVs read only the newly appended rows
+DATA_INCREMENTAL = os.environ.get("DATA_INCREMENTAL", "1") == "1"
+# The longest incremental refreshes go on before a source is read in full again,
+# which catches edits to rows before the watermark that a tail read cannot see
+DATA_FULL_RELOAD_INTERVAL = float(os.environ.get("DATA_FULL_RELOAD_INTERVAL", 3600))
+# The memory budget of the serialized figure cache
+FIGURE_CACHE_BYTES = int(float(os.environ.get("FIGURE_CACHE_MB", 64)) * 2**20)
+# The most points a daily time series sends to the browser
+DOWNSAMPLE_POINTS = int(os.environ.get("DOWNSAMPLE_POINTS", 2000))
+# Scatter plots with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = int(os.environ.get("WEBGL_THRESHOLD", 1000))
+# Seconds the app may take to import before a warning is logged
+STARTUP_BUDGET = float(os.environ.get("STARTUP_BUDGET", 5))
+# How accordion figures are prebuilt: "thread", "process", or "none" to build each when opened
+FIGURE_POOL = os.environ.get("FIGURE_POOL", "thread")
+# The number of figures prebuilt at once
+FIGURE_WORKERS = int(os.environ.get("FIGURE_WORKERS", os.cpu_count() or 1))
+# Whether callbacks and helpers are timed and served at /metrics
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+# Where a cProfile dump of every callback request is written (empty disables it)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+# The decimals floats are rounded to when figures are sent to the browser
+FIGURE_DECIMALS = int(os.environ.get("FIGURE_DECIMALS", 3))
+# The encodings responses are compressed with, in order of preference (empty disables compression)
+RESPONSE_COMPRESSION = [name for name in os.environ.get("RESPONSE_COMPRESSION", "br,gzip").split(",") if name]
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+# Whether repeated callback requests for unchanged data are answered with 304 Not Modified
+CONDITIONAL_CALLBACKS = os.environ.get("CONDITIONAL_CALLBACKS", "1") == "1"
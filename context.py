@@ -0,0 +1,115 @@
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+import groups
+import metrics
+import trendlines
+from datasets import Dataset
+
+
+class WindowContext:
+    """
+    Everything the callbacks of one time window compute from the
+    weightlifting dataset: the rows of the window, the muscle groups and
+    exercises trained in it, their partitions, and the running maxima.
+
+    A dropdown change fires several callbacks with the same window, and
+    each of them used to look all of this up on its own. Contexts are
+    shared through the dataset (see get_context), so whichever callback
+    gets there first computes each value and the others reuse it. Values
+    are only computed on first use, and a new version of the dataset
+    starts with new contexts.
+
+    :param dataset: the weightlifting dataset
+    :param rows: the rows of the time window (see utils.window_slice)
+    """
+
+    def __init__(self, dataset: Dataset, rows: slice):
+        self.dataset = dataset
+        self.rows = rows
+        self.index = groups.get_group_index(dataset)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: tuple, build: Callable[[], object]):
+        # Values are built under the lock, so concurrent callbacks wait for
+        # the first one rather than building the same value again
+        with self._lock:
+            if key not in self._values:
+                metrics.count("window_context_miss")
+                self._values[key] = build()
+            else:
+                metrics.count("window_context_hit")
+            return self._values[key]
+
+    @property
+    def muscles(self) -> list:
+        """
+        The muscle groups, in sorted order, that have sets in the window.
+        """
+        return self._get(("muscles",), lambda: self.index.muscles(self.rows))
+
+    def exercises(self, muscle: str) -> list:
+        """
+        Lists the exercises, in sorted order, of a muscle group that have
+        sets in the window.
+
+        :param muscle: the muscle group
+        """
+        return self._get(("exercises", muscle), lambda: self.index.exercises(muscle, self.rows))
+
+    def positions(self, muscle: str, exercise: Optional[str] = None) -> np.ndarray:
+        """
+        Retrieves the row positions of a muscle group or one of its
+        exercises within the window.
+
+        :param muscle: the muscle group
+        :param exercise: the exercise, or None for the whole muscle group
+        """
+        return self._get(
+            ("positions", muscle, exercise),
+            lambda: self.index.positions(muscle, exercise, self.rows)
+        )
+
+    def frame(self, muscle: str, exercise: Optional[str] = None) -> pd.DataFrame:
+        """
+        Retrieves the sets of a muscle group or one of its exercises within
+        the window.
+
+        :param muscle: the muscle group
+        :param exercise: the exercise, or None for the whole muscle group
+        """
+        # Not kept, since the figures built from it are cached already
+        return self.dataset.frame.take(self.positions(muscle, exercise))
+
+    def expanding_max(self, column: str, by: list):
+        """
+        Retrieves the running maximum of a column within the window (see
+        trendlines.get_expanding_max).
+
+        :param column: the column to take the running maximum of
+        :param by: the columns that define a group
+        """
+        return self._get(
+            ("expanding_max", column, tuple(by)),
+            lambda: trendlines.get_expanding_max(self.dataset, self.rows, column, by)
+        )
+
+
+@metrics.instrument("filter")
+def get_context(dataset: Dataset, rows: slice) -> WindowContext:
+    """
+    Retrieves the context of a time window, creating it once per version of
+    the data and range of rows. Windows that cover the same rows (e.g.,
+    "Last 12 Months" and "Last Year") share a context.
+
+    :param dataset: the weightlifting dataset
+    :param rows: the rows of the time window (see utils.window_slice)
+    """
+    return dataset.derive(
+        f"window_context:{rows.start}:{rows.stop}",
+        lambda df: WindowContext(dataset, rows)
+    )
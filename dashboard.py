@@ -1,11 +1,22 @@
+import time
+
+# Boot time is measured from here so it covers every import below
+started = time.perf_counter()
+
 import dash
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.io as pio
 from dash import Input, Output, callback, dcc, html
 
+import cache
 import callbacks
+import constants
+import metrics
+import responses
+import utils
 from layouts import home_layout, intellectual_layout, physical_layout
+from refresher import refresher
 
 TRC_LOGO = "https://avatars.githubusercontent.com/u/42280715"
 pio.templates[pio.templates.default].layout.colorway = px.colors.qualitative.G10
@@ -21,20 +32,47 @@ app = dash.Dash(
 # Special line of code for Heroku
 server = app.server
 
+# Times every callback request and serves the timings at /metrics
+metrics.install(app)
+metrics.registry.add_collector("figure_cache", cache.figure_cache.stats)
+metrics.registry.add_collector("dataset_cache", cache.dataset_cache.stats)
+metrics.registry.add_collector("refresher", refresher.stats, label="dataset")
+
+# Compresses responses and answers repeated requests for unchanged data with a 304
+responses.install(app)
+
+# Keeps the data fresh off the request path, starting now and again in each forked worker
+if constants.DATA_REFRESH_INTERVAL > 0:
+    refresher.start(utils.fetch_dataset, warm=physical_layout)
+
 # Define components
 dropdown = dbc.Row(
     [
         dbc.Col(
             [
                 dcc.Dropdown(
-                    ["All Time", "Last Three Months"],
+                    constants.TIME_WINDOWS,
                     "All Time",
                     id="dropdown"
                 ),
             ],
+        ),
+        dbc.Col(
+            [
+                # Picks an explicit range instead (see callbacks.select_time_window)
+                dcc.DatePickerRange(
+                    id="date-range",
+                    clearable=True,
+                    updatemode="bothdates",
+                    start_date_placeholder_text="From",
+                    end_date_placeholder_text="To",
+                    display_format="YYYY-MM-DD"
+                ),
+            ],
+            width="auto",
         )
     ],
-    className="col-3",
+    className="col-5",
     align="center",
 )
 
@@ -101,16 +139,25 @@ app.layout = dbc.Container([
     Output("page-content", "children"),
     Input("url", "pathname")
 )
+@metrics.instrument_callback
 def display_page(pathname):
     if pathname == "/":
         return home_layout
     elif pathname == "/physical-wellness":
-        return physical_layout
+        return physical_layout()
     elif pathname == "/intellectual-wellness":
         return intellectual_layout
     else:
         return "404"
 
 
+# Nothing above should touch the network or scale with the data
+startup_time = time.perf_counter() - started
+if startup_time > constants.STARTUP_BUDGET:
+    app.logger.warning(f"Startup took {startup_time:.2f}s, over the {constants.STARTUP_BUDGET:.2f}s budget")
+else:
+    app.logger.info(f"Startup took {startup_time:.2f}s")
+
+
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,84 @@
+import hashlib
+import threading
+from typing import Callable, Optional
+
+import pandas as pd
+
+import schema
+
+
+def fingerprint(frame: pd.DataFrame) -> str:
+    """
+    Hashes the contents of a dataframe. The same rows get the same
+    fingerprint however they were loaded (e.g., appended or read in full).
+
+    :param frame: the rows to hash
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+class Dataset:
+    """
+    An immutable, versioned dataset.
+
+    Anything computed from the rows (rollups, indexes, statistics) is built
+    through derive, so it is computed at most once per version. When a
+    dataset was produced by appending rows to another one, derived values
+    that know how to extend themselves are updated from the previous
+    version instead of being rebuilt.
+
+    :param frame: the prepared rows, which must not be mutated
+    :param version: a fingerprint of the rows
+    """
+
+    def __init__(self, frame: pd.DataFrame, version: Optional[str] = None):
+        self.frame = frame
+        self.version = version or fingerprint(frame)
+        self._derived = {}
+        self._lock = threading.RLock()
+        self._base: Optional["Dataset"] = None
+        self._rows: Optional[pd.DataFrame] = None
+
+    def __len__(self):
+        return len(self.frame)
+
+    def extend(self, rows: pd.DataFrame, drop: int = 0) -> "Dataset":
+        """
+        Creates the next version of this dataset with rows appended.
+
+        :param rows: the prepared rows to append
+        :param drop: the number of trailing rows to replace
+        :return: the new dataset
+        """
+        history = self.frame.iloc[:len(self.frame) - drop] if drop else self.frame
+        # Hashed in full, so the version only depends on the rows
+        dataset = Dataset(schema.concat([history, rows]))
+        # Derived values cannot be extended once rows they covered are gone
+        if not drop:
+            with self._lock:
+                dataset._base = self
+                dataset._rows = rows
+                self._base = None
+                self._rows = None
+        return dataset
+
+    def derive(self, key: str, build: Callable[[pd.DataFrame], object], extend: Optional[Callable] = None):
+        """
+        Retrieves a value computed from this version of the dataset.
+
+        :param key: a name for the value
+        :param build: computes the value from the full frame
+        :param extend: updates the previous version's value with the
+            appended rows, as extend(previous_value, rows)
+        :return: the derived value
+        """
+        with self._lock:
+            if key not in self._derived:
+                base = self._base
+                if extend is not None and base is not None and key in base._derived:
+                    self._derived[key] = extend(base._derived[key], self._rows)
+                else:
+                    self._derived[key] = build(self.frame)
+            return self._derived[key]
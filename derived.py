@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+import constants
+from datasets import Dataset
+
+
+@dataclass(frozen=True)
+class DerivedColumn:
+    """
+    A column computed from the typed columns of a dataset. The computation
+    must work row by row, so appended rows can be computed on their own.
+
+    :param name: the name of the column
+    :param compute: computes the column from a frame
+    :param lazy: whether the column is only computed on first use (see
+        get_column) rather than added to every version of the dataset
+    """
+    name: str
+    compute: Callable[[pd.DataFrame], object]
+    lazy: bool = False
+
+
+# The derived columns of each dataset, in the order they are computed
+DERIVED = {
+    constants.WEIGHTLIFTING: [],
+    constants.FITBIT: [],
+}
+
+
+def register(dataset: str, name: str, lazy: bool = False):
+    """
+    Registers a function as the computation of a derived column.
+
+    :param dataset: the name of the dataset (e.g., constants.FITBIT)
+    :param name: the name of the column
+    :param lazy: whether to compute the column only on first use
+    """
+    def decorator(compute):
+        DERIVED[dataset].append(DerivedColumn(name, compute, lazy))
+        return compute
+    return decorator
+
+
+def add_derived(dataset: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds every eager derived column to a typed frame.
+
+    :param dataset: the name of the dataset (e.g., constants.FITBIT)
+    :param df: the typed rows (see schema.apply_schema)
+    """
+    for column in DERIVED[dataset]:
+        if not column.lazy:
+            df[column.name] = column.compute(df)
+    return df
+
+
+def get_column(dataset: str, value: Dataset, name: str) -> pd.Series:
+    """
+    Retrieves a derived column, computing it once per version of the data
+    and only for the appended rows when possible.
+
+    :param dataset: the name of the dataset (e.g., constants.FITBIT)
+    :param value: the dataset
+    :param name: the name of the column
+    """
+    if name in value.frame.columns:
+        return value.frame[name]
+    column = next(column for column in DERIVED[dataset] if column.name == name)
+    return value.derive(
+        f"column:{name}",
+        lambda df: pd.Series(column.compute(df), index=df.index, name=name),
+        lambda previous, rows: pd.concat(
+            [previous, pd.Series(column.compute(rows), name=name)],
+            ignore_index=True
+        )
+    )
+
+
+@register(constants.WEIGHTLIFTING, "Volume")
+def volume(df: pd.DataFrame):
+    return df["Weight"].to_numpy() * df["Total Reps"].to_numpy(np.float64, na_value=np.nan)
+
+
+@register(constants.WEIGHTLIFTING, "Projected 1RM")
+def epley(df: pd.DataFrame):
+    """
+    Projects the one rep maximum with the Epley formula, which is what
+    the dashboard plots.
+    """
+    return df["Weight"].to_numpy() * (1 + df["Reps"].to_numpy(np.float64, na_value=np.nan) / 30)
+
+
+@register(constants.WEIGHTLIFTING, "Projected 1RM (Brzycki)", lazy=True)
+def brzycki(df: pd.DataFrame):
+    """
+    Projects the one rep maximum with the Brzycki formula, which is only
+    defined below 37 reps.
+    """
+    reps = df["Reps"].to_numpy(np.float64, na_value=np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(reps < 37, df["Weight"].to_numpy() * 36 / (37 - reps), np.nan)
+
+
+@register(constants.FITBIT, "Total Sleep (hours)")
+def sleep_hours(df: pd.DataFrame):
+    return df["Total Sleep (minutes)"].to_numpy() / 60
+
+
+@register(constants.FITBIT, "Sleep (readable)")
+def sleep_readable(df: pd.DataFrame):
+    """
+    Formats sleep as hours and whole minutes (e.g., 7h 43m). Rather than
+    formatting every row, each distinct whole number of minutes is
+    formatted once and looked up by index.
+    """
+    minutes = df["Total Sleep (minutes)"].to_numpy(dtype=np.float64)
+    present = minutes >= 0
+    whole = np.floor(minutes, where=present, out=np.zeros(len(minutes))).astype(np.int64)
+    longest = int(whole.max()) if len(whole) else 0
+    hours, remainder = np.divmod(np.arange(longest + 1), 60)
+    labels = np.array([f"{h}h {m}m" for h, m in zip(hours, remainder)], dtype=object)
+    return np.where(present, labels[whole], None)
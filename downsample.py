@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def _numeric(x) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """
+    Picks the points that best preserve the shape of a series with the
+    Largest-Triangle-Three-Buckets algorithm: the first and last points
+    are kept, the rest are split into equal buckets, and from each bucket
+    the point forming the largest triangle with the previously picked
+    point and the average of the next bucket is kept.
+
+    :param x: the sorted x values (numbers or dates)
+    :param y: the y values, without NaNs
+    :param threshold: the number of points to keep
+    :return: the positions of the kept points, in order
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = _numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts, stops = edges[:-1], edges[1:]
+    # The average point of each bucket, plus the last point for the last bucket
+    sizes = stops - starts
+    average_x = np.append(np.add.reduceat(x[:-1], starts) / sizes, x[-1])
+    average_y = np.append(np.add.reduceat(y[:-1], starts) / sizes, y[-1])
+
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = n - 1
+    previous = 0
+    for bucket, (start, stop) in enumerate(zip(starts, stops)):
+        ax, ay = x[previous], y[previous]
+        cx, cy = average_x[bucket + 1], average_y[bucket + 1]
+        areas = np.abs((ax - cx) * (y[start:stop] - ay) - (ax - x[start:stop]) * (cy - ay))
+        previous = start + int(np.argmax(areas))
+        picked[bucket + 1] = previous
+    return picked
+
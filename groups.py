@@ -0,0 +1,112 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from datasets import Dataset
+
+
+class GroupIndex:
+    """
+    A muscle group → exercise → row positions index of the weightlifting
+    dataset.
+
+    Rows are grouped once by their categorical codes, so any partition can
+    be looked up directly instead of masking the whole frame. Positions
+    within a partition are kept in row order, and since the dataset is
+    sorted by date, a time window is a contiguous run of them.
+
+    :param df: the weightlifting dataset, sorted by date
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        muscle_codes, muscles = pd.factorize(df["Muscle Groups"], sort=True)
+        exercise_codes, exercises = pd.factorize(df["Exercise"], sort=True)
+        width = max(len(exercises), 1)
+        keys = muscle_codes.astype(np.int64) * width + exercise_codes
+        valid = np.flatnonzero((muscle_codes >= 0) & (exercise_codes >= 0))
+        order = valid[np.argsort(keys[valid], kind="stable")]
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.diff(sorted_keys, prepend=-1))
+        stops = np.append(starts[1:], len(order))
+
+        self._exercises = {}
+        for start, stop in zip(starts, stops):
+            muscle_code, exercise_code = divmod(int(sorted_keys[start]), width)
+            partitions = self._exercises.setdefault(muscles[muscle_code], {})
+            partitions[exercises[exercise_code]] = order[start:stop]
+        self._muscles = {
+            muscle: np.sort(np.concatenate(list(partitions.values())))
+            for muscle, partitions in self._exercises.items()
+        }
+
+    @staticmethod
+    def _within(positions: np.ndarray, rows: Optional[slice]) -> np.ndarray:
+        if rows is None:
+            return positions
+        return positions[positions.searchsorted(rows.start):positions.searchsorted(rows.stop)]
+
+    def muscles(self, rows: Optional[slice] = None) -> list:
+        """
+        Lists the muscle groups, in sorted order, that have sets in a range of rows.
+
+        :param rows: the rows to consider (e.g., from utils.window_slice)
+        """
+        return [
+            muscle
+            for muscle, positions in self._muscles.items()
+            if len(self._within(positions, rows))
+        ]
+
+    def exercises(self, muscle: str, rows: Optional[slice] = None) -> list:
+        """
+        Lists the exercises, in sorted order, of a muscle group that have
+        sets in a range of rows.
+
+        :param muscle: the muscle group
+        :param rows: the rows to consider
+        """
+        return [
+            exercise
+            for exercise, positions in self._exercises.get(muscle, {}).items()
+            if len(self._within(positions, rows))
+        ]
+
+    def positions(self, muscle: str, exercise: Optional[str] = None, rows: Optional[slice] = None) -> np.ndarray:
+        """
+        Retrieves the row positions of a muscle group or one of its exercises.
+
+        :param muscle: the muscle group
+        :param exercise: the exercise, or None for the whole muscle group
+        :param rows: the rows to consider
+        """
+        if exercise is None:
+            positions = self._muscles.get(muscle)
+        else:
+            positions = self._exercises.get(muscle, {}).get(exercise)
+        if positions is None:
+            return np.empty(0, dtype=np.int64)
+        return self._within(positions, rows)
+
+    def frame(self, df: pd.DataFrame, muscle: str, exercise: Optional[str] = None, rows: Optional[slice] = None) -> pd.DataFrame:
+        """
+        Retrieves the sets of a muscle group or one of its exercises.
+
+        :param df: the dataset the index was built from
+        :param muscle: the muscle group
+        :param exercise: the exercise, or None for the whole muscle group
+        :param rows: the rows to consider
+        """
+        return df.take(self.positions(muscle, exercise, rows))
+
+
+@metrics.instrument("aggregate")
+def get_group_index(dataset: Dataset) -> GroupIndex:
+    """
+    Retrieves the group index of the weightlifting dataset, building it
+    once per version of the data.
+
+    :param dataset: the weightlifting dataset
+    """
+    return dataset.derive("group_index", GroupIndex)
@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from datasets import Dataset
+
+# The Fitbit columns summarized by the highlight cards
+HIGHLIGHT_COLUMNS = ["Steps", "Weight", "Total Sleep (minutes)", "Resting Heart Rate"]
+
+
+@dataclass
+class ColumnStats:
+    """
+    The summary statistics of a single column, ignoring missing values.
+
+    Everything but the value counts is a running total, and the median and
+    mode are read off the sorted value counts, so the statistics can be
+    combined with those of appended rows without revisiting old rows.
+    Ties for the minimum and maximum go to the earliest row.
+    """
+    count: int
+    total: float
+    minimum: Optional[float]
+    minimum_date: Optional[pd.Timestamp]
+    maximum: Optional[float]
+    maximum_date: Optional[pd.Timestamp]
+    counts: pd.Series
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    @property
+    def median(self) -> Optional[float]:
+        if not self.count:
+            return None
+        ends = np.cumsum(self.counts.to_numpy())
+        values = self.counts.index.to_numpy()
+        lower = values[np.searchsorted(ends, (self.count - 1) // 2, side="right")]
+        upper = values[np.searchsorted(ends, self.count // 2, side="right")]
+        return (lower + upper) / 2
+
+    @property
+    def mode(self) -> Optional[float]:
+        if not self.count:
+            return None
+        # Matches Series.mode()[0], the smallest of the most common values
+        return self.counts.index[np.argmax(self.counts.to_numpy())]
+
+
+@dataclass
+class Highlights:
+    """
+    The number of records in the Fitbit dataset and the statistics of each
+    highlighted column.
+    """
+    records: int
+    columns: dict
+
+
+def compute_highlights(df: pd.DataFrame, columns: list = HIGHLIGHT_COLUMNS) -> Highlights:
+    """
+    Computes the statistics of every column at once over a single matrix
+    of the values.
+
+    :param df: the Fitbit dataset, sorted by date
+    :param columns: the columns to summarize
+    """
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = np.isnan(values)
+    counts = (~missing).sum(axis=0)
+    totals = np.where(missing, 0, values).sum(axis=0)
+    lows = np.where(missing, np.inf, values).argmin(axis=0)
+    highs = np.where(missing, -np.inf, values).argmax(axis=0)
+    dates = df["Date"].to_numpy()
+
+    stats = {}
+    for i, column in enumerate(columns):
+        present = values[~missing[:, i], i]
+        unique, occurrences = np.unique(present, return_counts=True)
+        found = counts[i] > 0
+        stats[column] = ColumnStats(
+            count=int(counts[i]),
+            total=float(totals[i]),
+            minimum=values[lows[i], i] if found else None,
+            minimum_date=pd.Timestamp(dates[lows[i]]) if found else None,
+            maximum=values[highs[i], i] if found else None,
+            maximum_date=pd.Timestamp(dates[highs[i]]) if found else None,
+            counts=pd.Series(occurrences, index=unique),
+        )
+    return Highlights(len(df), stats)
+
+
+def merge_stats(old: ColumnStats, new: ColumnStats) -> ColumnStats:
+    """
+    Combines the statistics of a column with those of rows that came after.
+
+    :param old: the statistics of the earlier rows
+    :param new: the statistics of the later rows
+    """
+    low = old if new.minimum is None or (old.minimum is not None and old.minimum <= new.minimum) else new
+    high = old if new.maximum is None or (old.maximum is not None and old.maximum >= new.maximum) else new
+    return ColumnStats(
+        count=old.count + new.count,
+        total=old.total + new.total,
+        minimum=low.minimum,
+        minimum_date=low.minimum_date,
+        maximum=high.maximum,
+        maximum_date=high.maximum_date,
+        counts=old.counts.add(new.counts, fill_value=0).sort_index().astype(np.int64),
+    )
+
+
+def extend_highlights(highlights: Highlights, rows: pd.DataFrame) -> Highlights:
+    """
+    Folds newly appended days into existing highlights.
+
+    :param highlights: the highlights of the previous version of the dataset
+    :param rows: the appended rows
+    """
+    new = compute_highlights(rows, list(highlights.columns))
+    return Highlights(
+        highlights.records + new.records,
+        {
+            column: merge_stats(stats, new.columns[column])
+            for column, stats in highlights.columns.items()
+        }
+    )
+
+
+@metrics.instrument("aggregate")
+def get_highlights(dataset: Dataset) -> Highlights:
+    """
+    Retrieves the highlights of the Fitbit dataset, computing them once
+    per version of the data.
+
+    :param dataset: the Fitbit dataset
+    """
+    return dataset.derive("highlights", compute_highlights, extend_highlights)
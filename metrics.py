@@ -0,0 +1,405 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Optional
+
+import constants
+
+# The stages a request's time is split into
+STAGES = ["fetch", "parse", "filter", "aggregate", "trendline", "figure", "serialize", "callback"]
+
+# The upper bounds (in seconds) of the callback latency histogram
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf]
+
+# Work done outside of any callback, e.g. by the background refresher
+BACKGROUND = "background"
+
+
+class Profile:
+    """
+    The time one callback (or one piece of background work) spent in each
+    stage. Stages can nest, e.g. a figure helper that filters rows, and
+    each stage is only charged the time not spent in the stages nested in
+    it, so the stages of a profile add up to its total time.
+
+    :param callback: the name of the callback being profiled
+    """
+
+    def __init__(self, callback: Optional[str] = None):
+        self.callback = callback
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.events = defaultdict(int)
+        self.profiler: Optional[cProfile.Profile] = None
+        self._stack = []
+
+    def enter(self):
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, stage: str) -> float:
+        started, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        if self._stack:
+            self._stack[-1][1] += elapsed
+        self.stages[stage] += elapsed - nested
+        return elapsed
+
+
+_profile: contextvars.ContextVar = contextvars.ContextVar("profile", default=None)
+
+
+class Registry:
+    """
+    Accumulates the timings of every profile, the latency and response
+    size of every callback, and the calls of every instrumented function,
+    and renders them in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = defaultdict(lambda: [0, 0.0])
+        self._events = defaultdict(int)
+        self._functions = defaultdict(lambda: [0, 0.0])
+        self._latency = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self._latency_sums = defaultdict(float)
+        self._bytes = defaultdict(lambda: [0, 0])
+        self._collectors = []
+
+    def record_profile(self, profile: Profile):
+        callback = profile.callback or BACKGROUND
+        with self._lock:
+            for stage, seconds in profile.stages.items():
+                totals = self._stages[(callback, stage)]
+                totals[0] += 1
+                totals[1] += seconds
+            for event, count in profile.events.items():
+                self._events[(callback, event)] += count
+
+    def record_function(self, function: str, seconds: float):
+        with self._lock:
+            totals = self._functions[function]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def record_response(self, callback: str, seconds: float, size: int):
+        with self._lock:
+            buckets = self._latency[callback]
+            for position, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[position] += 1
+            self._latency_sums[callback] += seconds
+            totals = self._bytes[callback]
+            totals[0] += 1
+            totals[1] += size
+
+    def add_collector(self, prefix: str, stats: Callable[[], dict], label: Optional[str] = None):
+        """
+        Exposes the numbers reported by a stats function (e.g.,
+        cache.figure_cache.stats) as gauges.
+
+        :param prefix: the prefix of the gauge names
+        :param stats: reports the numbers, by name
+        :param label: if the stats are nested (e.g., refresher.stats, by
+            dataset), the label of the outer keys
+        """
+        self._collectors.append((prefix, stats, label))
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text format.
+        """
+        lines = []
+
+        def family(name: str, kind: str, description: str, samples: list):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_labels(labels)} {_number(value)}")
+
+        with self._lock:
+            family(
+                "dashboard_stage_seconds", "summary",
+                "Time spent in each stage of each callback, excluding nested stages",
+                [
+                    sample
+                    for (callback, stage), (count, total) in sorted(self._stages.items())
+                    for sample in [
+                        ("_count", {"callback": callback, "stage": stage}, count),
+                        ("_sum", {"callback": callback, "stage": stage}, total),
+                    ]
+                ]
+            )
+            family(
+                "dashboard_function_seconds", "summary",
+                "Time spent in each instrumented function, including nested calls",
+                [
+                    sample
+                    for function, (count, total) in sorted(self._functions.items())
+                    for sample in [
+                        ("_count", {"function": function}, count),
+                        ("_sum", {"function": function}, total),
+                    ]
+                ]
+            )
+            family(
+                "dashboard_callback_seconds", "histogram",
+                "Time to answer each callback request, serialization included",
+                [
+                    sample
+                    for callback, buckets in sorted(self._latency.items())
+                    for sample in [
+                        ("_bucket", {"callback": callback, "le": bound}, count)
+                        for bound, count in zip(LATENCY_BUCKETS, buckets)
+                    ] + [
+                        ("_count", {"callback": callback}, buckets[-1]),
+                        ("_sum", {"callback": callback}, self._latency_sums[callback]),
+                    ]
+                ]
+            )
+            family(
+                "dashboard_callback_response_bytes", "summary",
+                "Size of each callback response body",
+                [
+                    sample
+                    for callback, (count, total) in sorted(self._bytes.items())
+                    for sample in [
+                        ("_count", {"callback": callback}, count),
+                        ("_sum", {"callback": callback}, total),
+                    ]
+                ]
+            )
+            family(
+                "dashboard_events_total", "counter",
+                "Events (e.g., figure cache hits) seen by each callback",
+                [
+                    ("", {"callback": callback, "event": event}, count)
+                    for (callback, event), count in sorted(self._events.items())
+                ]
+            )
+            collectors = list(self._collectors)
+
+        for prefix, stats, label in collectors:
+            for name, samples in _collect(stats(), label).items():
+                family(f"dashboard_{prefix}_{name}", "gauge", f"{prefix} {name}", samples)
+        return "\n".join(lines) + "\n"
+
+
+def _collect(stats: dict, label: Optional[str]) -> dict:
+    numbers = defaultdict(list)
+    for key, value in stats.items():
+        if label is not None and isinstance(value, dict):
+            for name, number in value.items():
+                if isinstance(number, (int, float)):
+                    numbers[name].append(("", {label: key}, number))
+        elif isinstance(value, (int, float)):
+            numbers[key].append(("", {}, value))
+    return numbers
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    if isinstance(value, float):
+        return _number(value)
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+registry = Registry()
+
+
+@contextlib.contextmanager
+def _stage(name: str, function: Optional[str] = None):
+    profile = _profile.get()
+    token = None
+    if profile is None:
+        profile = Profile()
+        token = _profile.set(profile)
+    profile.enter()
+    try:
+        yield profile
+    finally:
+        elapsed = profile.exit(name)
+        if function is not None:
+            registry.record_function(function, elapsed)
+        if token is not None:
+            _profile.reset(token)
+            registry.record_profile(profile)
+
+
+def stage(name: str):
+    """
+    Times a block of code as a stage (see STAGES) of whatever callback is
+    running.
+
+        with metrics.stage("serialize"):
+            serialized = pio.to_json(figure)
+
+    :param name: the name of the stage
+    """
+    if not constants.METRICS_ENABLED:
+        return contextlib.nullcontext()
+    return _stage(name)
+
+
+def count(event: str):
+    """
+    Counts an event (e.g., a cache hit) against whatever callback is running.
+
+    :param event: the name of the event
+    """
+    if not constants.METRICS_ENABLED:
+        return
+    profile = _profile.get()
+    if profile is None:
+        registry.record_profile(_single_event(event))
+    else:
+        profile.events[event] += 1
+
+
+def _single_event(event: str) -> Profile:
+    profile = Profile()
+    profile.events[event] += 1
+    return profile
+
+
+def instrument(stage_name: str):
+    """
+    Times every call of a function as a stage of whatever callback is
+    running, and on its own under the function's name. When metrics are
+    disabled, the function is returned untouched.
+
+    :param stage_name: the stage the function belongs to (see STAGES)
+    """
+    def decorator(function):
+        if not constants.METRICS_ENABLED:
+            return function
+        name = f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _stage(stage_name, name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_callback(function):
+    """
+    Times a Dash callback, attributing the stages of everything it calls
+    to it. Apply it below @callback so Dash registers the timed function.
+    """
+    if not constants.METRICS_ENABLED:
+        return function
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = _profile.get()
+        token = None
+        if profile is None:
+            # Called outside of a request (e.g., by the benchmarks)
+            profile = Profile()
+            token = _profile.set(profile)
+        profile.callback = name
+        try:
+            with _stage("callback", f"{function.__module__}.{name}"):
+                return function(*args, **kwargs)
+        finally:
+            if token is not None:
+                _profile.reset(token)
+                registry.record_profile(profile)
+    return wrapper
+
+
+def install(app, profile_dir: str = constants.PROFILE_DIR):
+    """
+    Profiles every callback request of a Dash app and serves the metrics
+    at /metrics on its server.
+
+    The time a request takes beyond its callback (parsing the request and
+    serializing the response) is charged to the serialize stage. If a
+    profile directory is given, each callback request is also profiled
+    with cProfile and dumped there as <time>-<callback>.prof, next to a
+    .json of its stages.
+
+    :param app: the Dash app
+    :param profile_dir: where to dump request profiles (empty disables it)
+    """
+    if not constants.METRICS_ENABLED:
+        return
+    import flask
+
+    server = app.server
+    endpoint = app.config.requests_pathname_prefix + "_dash-update-component"
+
+    @server.before_request
+    def start_profile():
+        if flask.request.path != endpoint:
+            return
+        profile = Profile()
+        flask.g.metrics_token = _profile.set(profile)
+        if profile_dir:
+            profile.profiler = cProfile.Profile()
+            profile.profiler.enable()
+
+    @server.after_request
+    def finish_profile(response):
+        profile = _profile.get()
+        if flask.request.path != endpoint or profile is None:
+            return response
+        if profile.profiler is not None:
+            profile.profiler.disable()
+        _profile.reset(flask.g.pop("metrics_token"))
+
+        elapsed = time.perf_counter() - profile.started
+        profile.stages["serialize"] += max(elapsed - sum(profile.stages.values()), 0)
+        # e.g., answered with a 304 before the callback ran
+        profile.callback = profile.callback or "unknown"
+        callback = profile.callback
+        size = response.calculate_content_length() or 0
+        registry.record_profile(profile)
+        registry.record_response(callback, elapsed, size)
+        if profile_dir:
+            _dump(profile, callback, elapsed, size, profile_dir)
+        return response
+
+    @server.teardown_request
+    def drop_profile(error=None):
+        # Only left over when the request failed before after_request
+        token = flask.g.pop("metrics_token", None)
+        if token is not None:
+            _profile.reset(token)
+
+    @server.route("/metrics")
+    def serve_metrics():
+        return flask.Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def _dump(profile: Profile, callback: str, elapsed: float, size: int, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.time():.3f}-{callback}")
+    profile.profiler.dump_stats(f"{path}.prof")
+    with open(f"{path}.json", "w") as file:
+        json.dump(
+            {"callback": callback, "seconds": elapsed, "bytes": size, "stages": profile.stages, "events": profile.events},
+            file,
+            indent=2
+        )
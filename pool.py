@@ -0,0 +1,123 @@
+import atexit
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import cache
+import constants
+import serialization
+import shared
+import utils
+from datasets import Dataset
+
+# The builder of each kind of figure the pool can prebuild, each called as
+# builder(dataset, *args)
+BUILDERS = {
+    "volume": utils.build_volume_figure,
+    "1rm": utils.build_1rm_figure,
+    "sets_reps": utils.build_sets_reps_figure,
+}
+
+
+class FigurePool:
+    """
+    Builds the figures of accordion panels ahead of time, in parallel, so
+    opening a panel finds its figure in the figure cache (or waits on the
+    build already underway) instead of building it on the spot.
+
+    Builds are driven by a thread pool and stored in the figure cache in
+    the order they were requested, so the first panels are ready first.
+    With the process kind, each figure is built and serialized by a worker
+    process, which maps the dataset from the shared store (see
+    shared.SharedStore) rather than being sent a pickled copy. Figures whose
+    data is not in the shared store are built by the thread instead.
+
+    When a new batch of the same kind is requested (e.g., the time window
+    changed), builds that have not started yet are dropped.
+
+    :param kind: "thread", "process", or "none" to build every figure when
+        its panel is opened
+    :param workers: the number of figures built at once
+    :param store: where worker processes map datasets from
+    """
+
+    def __init__(self, kind: str = constants.FIGURE_POOL, workers: int = constants.FIGURE_WORKERS, store: Optional[shared.SharedStore] = shared.shared_store):
+        self.kind = kind
+        self.workers = workers
+        self.store = store
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.kind != "none" and self.workers > 0
+
+    def _executors(self):
+        # Executors do not survive a fork, so each worker process of the server starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix="figures")
+                self._processes = None
+                if self.kind == "process" and self.store is not None:
+                    self._processes = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn"))
+                    atexit.register(self._processes.shutdown, cancel_futures=True)
+                self._pending = {}
+                self._pid = os.getpid()
+            return self._threads, self._processes
+
+    def prebuild(self, kind: str, dataset: str, value: Dataset, batch: list):
+        """
+        Queues a batch of figures to be built into the figure cache.
+
+        :param kind: the kind of figure (see BUILDERS)
+        :param dataset: the name of the dataset (e.g., constants.WEIGHTLIFTING)
+        :param value: the dataset
+        :param batch: the (figure cache params, builder args) of each figure
+        :return: the futures of the queued builds
+        """
+        if not self.enabled:
+            return []
+        threads, processes = self._executors()
+        futures = []
+        for params, args in batch:
+            if cache.figure_cache.contains(kind, params, value.version):
+                continue
+            build = functools.partial(self._build, processes, kind, dataset, value, args)
+            futures.append(threads.submit(cache.figure_cache.get, kind, params, value.version, build))
+        with self._lock:
+            previous = self._pending.get(kind, [])
+            self._pending[kind] = futures
+        for future in previous:
+            future.cancel()
+        return futures
+
+    def _build(self, processes: Optional[ProcessPoolExecutor], kind: str, dataset: str, value: Dataset, args: tuple):
+        if processes is not None and self.store.current(dataset) == value.version:
+            try:
+                return processes.submit(_build_mapped, kind, dataset, value.version, args).result()
+            except Exception:
+                # e.g., a worker died, so this figure is built here instead
+                pass
+        return BUILDERS[kind](value, *args)
+
+
+@functools.lru_cache(maxsize=4)
+def _map_dataset(dataset: str, version: str) -> Dataset:
+    return shared.shared_store.load(dataset, version)
+
+
+def _build_mapped(kind: str, dataset: str, version: str, args: tuple) -> str:
+    """
+    Builds and serializes a figure in a worker process.
+    """
+    return serialization.to_json(BUILDERS[kind](_map_dataset(dataset, version), *args))
+
+
+figure_pool = FigurePool()
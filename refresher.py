@@ -0,0 +1,199 @@
+import functools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import constants
+import groups
+import highlights
+import rollups
+import shared
+from datasets import Dataset
+
+# Derived values rebuilt off the request path whenever a dataset changes
+WARMERS = {
+    constants.WEIGHTLIFTING: [groups.get_group_index] + [
+        functools.partial(rollups.get_rollup, name=name) for name in rollups.ROLLUPS
+    ],
+    constants.FITBIT: [highlights.get_highlights],
+}
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    The last good version of a dataset, when it was refreshed, and
+    whether it was mapped from the shared store.
+    """
+    dataset: Dataset
+    refreshed_at: float
+    shared: bool = False
+
+
+class Refresher:
+    """
+    Keeps every dataset fresh from a background thread.
+
+    Each round revalidates every source, rebuilds the derived values of
+    any dataset that changed, and only then swaps the new version into
+    the snapshots that requests read, so requests never wait on a fetch
+    once the first round is done. If a refresh fails, the last good
+    snapshot keeps being served and its staleness grows.
+
+    The thread is started along with refreshes, so the first request does
+    not pay for the first round, and again in every process forked after
+    that (e.g., the workers of gunicorn --preload). With a shared store,
+    only the worker holding its leader lock fetches the sources; the
+    others map the versions it publishes, so every worker serves the same
+    version from the same memory. Until the leader first publishes, the
+    others wait for it, and only fetch a private copy if it takes longer
+    than the fetch timeout; that copy is swapped for the mapped one on
+    the next round.
+
+    :param interval: the number of seconds between rounds
+    :param datasets: the names of the datasets to refresh
+    :param store: where workers share datasets, if anywhere
+    """
+
+    def __init__(self, interval: float = constants.DATA_REFRESH_INTERVAL, datasets: Optional[list] = None, store: Optional[shared.SharedStore] = shared.shared_store):
+        self.interval = interval
+        self.datasets = list(constants.DATA_SOURCES if datasets is None else datasets)
+        self.store = store
+        self._fetch: Optional[Callable] = None
+        self._warm: Optional[Callable[[], object]] = None
+        self._snapshots = {}
+        self._failures = {dataset: 0 for dataset in self.datasets}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._fetch is not None
+
+    def start(self, fetch: Callable[..., Dataset], warm: Optional[Callable[[], object]] = None):
+        """
+        Enables background refreshes and starts the first round.
+
+        :param fetch: loads a dataset, as fetch(dataset, max_age=0)
+        :param warm: called after each round to prebuild anything that
+            spans datasets (e.g., a page layout)
+        """
+        if self._fetch is None:
+            os.register_at_fork(after_in_child=self._after_fork)
+        self._fetch = fetch
+        self._warm = warm
+        self._ensure_thread()
+
+    def _after_fork(self):
+        # The parent's lock may have been held by a thread that does not exist here
+        self._lock = threading.Lock()
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._ready = threading.Event()
+            threading.Thread(target=self._run, name="refresher", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        ready = self._ready
+        while True:
+            for dataset in self.datasets:
+                self.refresh(dataset)
+            ready.set()
+            if self._warm is not None:
+                try:
+                    self._warm()
+                except Exception:
+                    # Whatever failed to prebuild is built by the next request instead
+                    pass
+            time.sleep(self.interval)
+
+    def refresh(self, dataset: str):
+        """
+        Revalidates a single dataset and swaps in its new version.
+
+        :param dataset: the name of the dataset (e.g., constants.FITBIT)
+        """
+        try:
+            value, mapped = self._load(dataset)
+            for warm in WARMERS.get(dataset, []):
+                warm(value)
+        except Exception as error:
+            self._failures[dataset] += 1
+            self._errors[dataset] = repr(error)
+            return
+        # A single assignment, so readers see either the old or the new snapshots
+        self._snapshots = {**self._snapshots, dataset: Snapshot(value, time.time(), mapped)}
+        self._errors.pop(dataset, None)
+
+    def _load(self, dataset: str):
+        """
+        Fetches a dataset, or maps the version the leader published.
+
+        :return: the dataset and whether it was mapped from the shared store
+        """
+        store = self.store
+        deadline = time.monotonic() + constants.DATA_FETCH_TIMEOUT
+        while True:
+            if store is None or store.lead():
+                value = self._fetch(dataset, max_age=0)
+                if store is not None:
+                    store.publish(dataset, value)
+                return value, False
+            version = store.current(dataset)
+            if version is not None:
+                break
+            if time.monotonic() >= deadline:
+                # The leader is slow to publish, so this worker serves its own copy for a round
+                return self._fetch(dataset, max_age=0), False
+            time.sleep(0.1)
+        snapshot = self._snapshots.get(dataset)
+        # Only a mapped snapshot is reused, so a private copy is dropped once a version is published
+        if snapshot is not None and snapshot.shared and snapshot.dataset.version == version:
+            return snapshot.dataset, True
+        return store.load(dataset, version), True
+
+    def get(self, dataset: str) -> Dataset:
+        """
+        Retrieves the latest snapshot of a dataset. Only the first requests
+        of a process wait, for the first round of refreshes.
+
+        :param dataset: the name of the dataset (e.g., constants.FITBIT)
+        """
+        self._ensure_thread()
+        snapshot = self._snapshots.get(dataset)
+        if snapshot is None:
+            self._ready.wait(constants.DATA_FETCH_TIMEOUT)
+            snapshot = self._snapshots.get(dataset)
+        if snapshot is None:
+            return self._fetch(dataset)
+        return snapshot.dataset
+
+    def stats(self) -> dict:
+        """
+        Reports the staleness (seconds since the last successful refresh),
+        version, failure count, and last error of each dataset.
+        """
+        now = time.time()
+        snapshots = self._snapshots
+        return {
+            dataset: {
+                "staleness": now - snapshots[dataset].refreshed_at if dataset in snapshots else None,
+                "version": snapshots[dataset].dataset.version if dataset in snapshots else None,
+                "failures": self._failures[dataset],
+                "error": self._errors.get(dataset),
+            }
+            for dataset in self.datasets
+        }
+
+
+refresher = Refresher()
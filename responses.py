@@ -0,0 +1,131 @@
+import datetime
+import glob
+import hashlib
+import os
+
+import dash
+import flask
+from flask_compress import Compress
+
+import constants
+import metrics
+import utils
+
+
+def build_id(app) -> str:
+    """
+    Identifies the code an app runs: the version of Dash, the modules next
+    to this one (which define the callbacks and layouts), and the assets.
+    A deploy that changes any of them changes what a callback returns for
+    the same request and data.
+
+    :param app: the Dash app
+    """
+    digest = hashlib.sha1(dash.__version__.encode())
+    paths = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py")))
+    paths += sorted(glob.glob(os.path.join(app.config.assets_folder, "**", "*"), recursive=True))
+    for path in paths:
+        if os.path.isfile(path):
+            digest.update(os.path.basename(path).encode())
+            with open(path, "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()[:12]
+
+
+def callback_etag(body: bytes, versions: list, today: datetime.date, build: str) -> str:
+    """
+    Derives the validator of a callback request from everything its
+    response depends on: the request itself (which callback, and the
+    values of its inputs and states), the version of every dataset, the
+    day the time windows are relative to, and the code (see build_id).
+
+    :param body: the body of the callback request
+    :param versions: the current version of every dataset
+    :param today: the date the time windows are relative to
+    :param build: the build of the app
+    """
+    digest = hashlib.sha1(body)
+    for version in versions:
+        digest.update(version.encode())
+    digest.update(today.isoformat().encode())
+    digest.update(build.encode())
+    return digest.hexdigest()
+
+
+def _current_etag(build: str):
+    try:
+        versions = [utils.load_dataset(dataset).version for dataset in constants.DATA_SOURCES]
+    except Exception:
+        # The callback reports the failure itself
+        return None
+    return callback_etag(flask.request.get_data(cache=True), versions, datetime.date.today(), build)
+
+
+def install(app):
+    """
+    Compresses the responses of a Dash app and lets clients revalidate the
+    ones they already have.
+
+    Responses over constants.COMPRESS_MIN_BYTES are compressed with the
+    first of constants.RESPONSE_COMPRESSION the client accepts. The layout
+    and dependencies are served with an ETag of their content, so a
+    revisit costs a 304. Callback requests are POSTs, which browsers never
+    revalidate, so their ETag is derived from the request and the data
+    versions instead (see callback_etag) and checked before the callback
+    runs. assets/revalidate.js keeps the responses in the browser and
+    sends their ETags back. The build is published in a meta tag of the
+    page, so the script keeps the responses of each build (and day)
+    apart and drops those of earlier ones.
+
+    Install it after metrics.install, so the timings and response sizes
+    at /metrics cover compression and 304s.
+
+    :param app: the Dash app
+    """
+    server = app.server
+    prefix = app.config.requests_pathname_prefix
+    callback_endpoint = prefix + "_dash-update-component"
+    static_endpoints = {prefix + "_dash-layout", prefix + "_dash-dependencies"}
+
+    if constants.RESPONSE_COMPRESSION:
+        server.config["COMPRESS_ALGORITHM"] = constants.RESPONSE_COMPRESSION
+        server.config["COMPRESS_MIN_SIZE"] = constants.COMPRESS_MIN_BYTES
+        Compress(server)
+
+    if not constants.CONDITIONAL_CALLBACKS:
+        return
+
+    build = build_id(app)
+    app.config.meta_tags.append({"name": "dash-build", "content": build})
+
+    @server.before_request
+    def check_callback_etag():
+        if flask.request.path != callback_endpoint or flask.request.method != "POST":
+            return None
+        etag = _current_etag(build)
+        if etag is None:
+            return None
+        flask.g.callback_etag = etag
+        if flask.request.if_none_match.contains_weak(etag):
+            metrics.count("not_modified")
+            response = flask.Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+        return None
+
+    # Registered after Compress, so it runs first and compression sees the ETag
+    @server.after_request
+    def add_etag(response):
+        if response.status_code != 200:
+            return response
+        if flask.request.path == callback_endpoint:
+            etag = flask.g.pop("callback_etag", None)
+            if etag is not None:
+                # Weak, since the same data may be sent with another encoding
+                response.set_etag(etag, weak=True)
+        elif flask.request.path in static_endpoints and not response.direct_passthrough:
+            response.add_etag()
+            response.headers["Cache-Control"] = "no-cache"
+            # Compress checks the tags of compressed responses, which get the encoding appended
+            response.make_conditional(flask.request)
+        return response
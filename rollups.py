@@ -0,0 +1,91 @@
+import pandas as pd
+
+import metrics
+import schema
+from datasets import Dataset
+
+# Each rollup is defined by its group keys, the aggregations that build it
+# from raw sets, and the aggregations that combine two partial rollups.
+ROLLUPS = {
+    "daily_exercise": (
+        ["Date", "Exercise"],
+        {
+            "Volume": ("Volume", "sum"),
+            "Projected 1RM": ("Projected 1RM", "max"),
+        },
+        {
+            "Volume": ("Volume", "sum"),
+            "Projected 1RM": ("Projected 1RM", "max"),
+        },
+    ),
+    "daily_muscle": (
+        ["Date", "Muscle Groups"],
+        {
+            "Volume": ("Volume", "sum"),
+            "Projected 1RM Total": ("Projected 1RM", "sum"),
+            "Sets": ("Projected 1RM", "count"),
+        },
+        {
+            "Volume": ("Volume", "sum"),
+            "Projected 1RM Total": ("Projected 1RM Total", "sum"),
+            "Sets": ("Sets", "sum"),
+        },
+    ),
+    "daily_workouts": (
+        ["Date"],
+        {
+            "Exercise": ("Exercise", "count"),
+        },
+        {
+            "Exercise": ("Exercise", "sum"),
+        },
+    ),
+}
+
+
+def build_rollup(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates the raw sets into a rollup sorted by date.
+
+    :param name: the name of the rollup in ROLLUPS
+    :param df: the weightlifting dataset
+    """
+    keys, build, _ = ROLLUPS[name]
+    # Categorical keys are left in order of appearance, so sort explicitly
+    rollup = df.groupby(keys, as_index=False, observed=True).agg(**build)
+    return rollup.sort_values(keys, ignore_index=True)
+
+
+def extend_rollup(name: str, rollup: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Folds newly appended sets into an existing rollup. Appended rows never
+    predate the existing ones, so only the groups from the first new date
+    onward need to be recombined.
+
+    :param name: the name of the rollup in ROLLUPS
+    :param rollup: the rollup of the previous version of the dataset
+    :param rows: the appended sets
+    """
+    if rows.empty:
+        return rollup
+    keys, _, merge = ROLLUPS[name]
+    start = rollup["Date"].searchsorted(rows["Date"].min())
+    recent = schema.concat([rollup.iloc[start:], build_rollup(name, rows)])
+    recent = recent.groupby(keys, as_index=False, observed=True).agg(**merge).sort_values(keys)
+    return schema.concat([rollup.iloc[:start], recent])
+
+
+@metrics.instrument("aggregate")
+def get_rollup(dataset: Dataset, name: str) -> pd.DataFrame:
+    """
+    Retrieves a rollup of the weightlifting dataset, building it once per
+    version of the data.
+
+    :param dataset: the weightlifting dataset
+    :param name: the name of the rollup in ROLLUPS
+    """
+    return dataset.derive(
+        f"rollup:{name}",
+        lambda df: build_rollup(name, df),
+        lambda rollup, rows: extend_rollup(name, rollup, rows)
+    )
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+import constants
+
+# The dtype of every raw column of each dataset. Names are categoricals,
+# flags are bools, counts use the smallest nullable integer type that fits
+# (so a blank cell is missing rather than malformed), and measurements
+# that can be missing stay floats (float32 only where the values are only
+# ever shown as whole numbers).
+SCHEMAS = {
+    constants.WEIGHTLIFTING: {
+        "Date": "datetime64[ns]",
+        "Muscle Groups": "category",
+        "Exercise": "category",
+        "Weight": "float64",
+        "Reps": "Int16",
+        "Sets": "Int16",
+        "Total Reps": "Int16",
+        "Per Arm": "bool",
+        "Difficulty": "Int8",
+    },
+    constants.FITBIT: {
+        "Date": "datetime64[ns]",
+        "Steps": "Int32",
+        "Weight": "float64",
+        "Total Sleep (minutes)": "float64",
+        "Resting Heart Rate": "float32",
+    },
+}
+
+# How typed values are shown in figures and tables
+LABELS = {
+    "Per Arm": {True: "Yes", False: "No"},
+}
+
+_BOOLS = {
+    True: True, "True": True, "true": True, "TRUE": True, 1: True, "1": True,
+    False: False, "False": False, "false": False, "FALSE": False, 0: False, "0": False,
+}
+
+
+class SchemaError(ValueError):
+    """
+    Raised when a dataset is missing columns or has values that do not
+    fit their declared types.
+    """
+
+
+def _convert(column: pd.Series, dtype: str):
+    """
+    Converts a column to its declared type.
+
+    :return: the converted column and a mask of the values that did not fit
+    """
+    if dtype == "category":
+        return column.astype("category"), np.zeros(len(column), dtype=bool)
+    if dtype == "bool":
+        if column.dtype == bool:
+            return column, np.zeros(len(column), dtype=bool)
+        converted = column.map(_BOOLS)
+        bad = converted.isna().to_numpy()
+        return converted.fillna(False).astype(bool), bad
+    if dtype.startswith("datetime"):
+        converted = pd.to_datetime(column, errors="coerce")
+        return converted.astype(dtype), converted.isna().to_numpy()
+    converted = pd.to_numeric(column, errors="coerce")
+    bad = (converted.isna() & column.notna()).to_numpy()
+    if dtype.lower().startswith("int"):
+        limits = np.iinfo(dtype.lower())
+        bad |= (
+            (converted != converted.round())
+            | (converted < limits.min)
+            | (converted > limits.max)
+        ).to_numpy() & converted.notna().to_numpy()
+        # Only the nullable types (e.g., "Int16") can hold blank cells
+        if dtype.startswith("int"):
+            bad |= converted.isna().to_numpy()
+            converted = converted.where(~bad, 0)
+        else:
+            converted = converted.where(~bad)
+    return converted.astype(dtype), bad
+
+
+def apply_schema(dataset: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts the raw columns of a freshly parsed dataset to their declared
+    types. Columns that are not declared are left alone.
+
+    :param dataset: the name of the dataset (e.g., constants.FITBIT)
+    :param df: the raw rows
+    :raises SchemaError: if a declared column is missing or any value
+        does not fit its type
+    """
+    schema = SCHEMAS[dataset]
+    missing = [column for column in schema if column not in df.columns]
+    if missing:
+        raise SchemaError(f"{dataset} is missing columns: {', '.join(missing)}")
+
+    problems = []
+    columns = {}
+    for column, dtype in schema.items():
+        columns[column], bad = _convert(df[column], dtype)
+        if bad.any():
+            rows = df.index[bad]
+            examples = ", ".join(f"{row} ({df[column][row]!r})" for row in rows[:5])
+            problems.append(f"{column} expects {dtype} but {len(rows)} rows do not fit, e.g. rows {examples}")
+    if problems:
+        raise SchemaError(f"{dataset} has malformed rows: " + "; ".join(problems))
+    return df.assign(**columns)
+
+
+def concat(frames: list) -> pd.DataFrame:
+    """
+    Concatenates frames without losing categoricals: pandas falls back to
+    objects when the categories differ, so they are unioned first.
+
+    :param frames: the frames to concatenate, all with the same columns
+    """
+    categoricals = [
+        column
+        for column in frames[0].columns
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype)
+    ]
+    if categoricals and len(frames) > 1:
+        categories = {
+            column: pd.api.types.union_categoricals(
+                [frame[column].astype("category") for frame in frames],
+                sort_categories=True
+            ).categories
+            for column in categoricals
+        }
+        frames = [
+            frame.assign(**{
+                column: pd.Categorical(frame[column], categories=categories[column])
+                for column in categoricals
+            })
+            for frame in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def with_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replaces typed values with what is shown in figures and tables:
+    labels for flags (e.g., Per Arm's True with "Yes") and plain values
+    for categoricals, which plotly express would otherwise order
+    differently.
+
+    :param df: the rows to show
+    """
+    columns = {
+        column: df[column].astype(object)
+        for column in df.columns
+        if isinstance(df[column].dtype, pd.CategoricalDtype)
+    }
+    columns.update({
+        column: df[column].map(labels)
+        for column, labels in LABELS.items()
+        if column in df.columns
+    })
+    return df.assign(**columns)
@@ -0,0 +1,117 @@
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+from plotly.basedatatypes import BaseFigure, BasePlotlyType
+from plotly.io.json import to_json_plotly
+
+import constants
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The trace attributes that hold one value per point
+ARRAY_ATTRIBUTES = ["x", "y", "z", "customdata", "text", "hovertext"]
+
+# Trace attributes left out when they only restate plotly.js's default
+DEFAULT_ATTRIBUTES = {"xaxis": "x", "yaxis": "y"}
+
+
+def _compact_array(values, decimals: int):
+    if not isinstance(values, (np.ndarray, pd.Series, pd.Index)):
+        return values
+    values = np.asarray(values)
+    # Plotly hands dates over as datetime objects
+    if values.dtype.kind == "O" and len(values) and isinstance(values[0], datetime.datetime):
+        try:
+            values = pd.DatetimeIndex(values).to_numpy()
+        except (TypeError, ValueError):
+            # e.g., mixed time zones, which plotly serializes on its own
+            return values
+    if values.dtype.kind == "M":
+        # Days are sent as "2022-03-01" rather than "2022-03-01T00:00:00"
+        days = values.astype("datetime64[D]")
+        if not np.isnat(values).any() and (days == values).all():
+            return np.datetime_as_string(days, unit="D")
+        return values
+    if values.dtype.kind == "f":
+        return values.round(decimals)
+    return values
+
+
+def compact_trace(trace: dict, decimals: int = constants.FIGURE_DECIMALS) -> dict:
+    """
+    Shrinks the JSON of a trace without changing how it is drawn: dates
+    at midnight are sent as days, floats are rounded, and attributes set
+    to their default are left out.
+
+    :param trace: the trace, as a plain dictionary
+    :param decimals: the decimals to round floats to
+    :return: the compacted trace
+    """
+    if isinstance(trace, BasePlotlyType):
+        trace = trace.to_plotly_json()
+    compacted = {
+        key: value
+        for key, value in trace.items()
+        if key not in DEFAULT_ATTRIBUTES or value != DEFAULT_ATTRIBUTES[key]
+    }
+    for key in ARRAY_ATTRIBUTES:
+        if key in compacted:
+            compacted[key] = _compact_array(compacted[key], decimals)
+    return compacted
+
+
+def compact_figure(figure, decimals: int = constants.FIGURE_DECIMALS) -> dict:
+    """
+    Shrinks the JSON of a figure without changing how it is drawn. Besides
+    compacting each trace (see compact_trace), the template only keeps
+    the defaults of the trace types the figure uses, which is most of its
+    size for a figure of a few traces.
+
+    :param figure: the figure, or a dictionary of its data and layout
+    :param decimals: the decimals to round floats to
+    :return: the compacted figure, as a plain dictionary
+    """
+    if isinstance(figure, BaseFigure):
+        figure = figure.to_plotly_json()
+    compacted = dict(figure)
+    compacted["data"] = [compact_trace(trace, decimals) for trace in figure.get("data", [])]
+
+    layout = figure.get("layout")
+    if isinstance(layout, BasePlotlyType):
+        layout = layout.to_plotly_json()
+    template = (layout or {}).get("template")
+    if isinstance(template, dict) and "data" in template:
+        types = {trace.get("type", "scatter") for trace in compacted["data"]}
+        compacted["layout"] = {
+            **layout,
+            "template": {
+                **template,
+                "data": {kind: value for kind, value in template["data"].items() if kind in types}
+            }
+        }
+    return compacted
+
+
+def to_json(figure) -> str:
+    """
+    Serializes a compacted figure (see compact_figure) with the fastest
+    JSON engine available.
+
+    :param figure: the figure, or a dictionary of its data and layout
+    """
+    return to_json_plotly(compact_figure(figure), engine="orjson" if orjson else "json")
+
+
+def loads(serialized: str):
+    """
+    Parses JSON (e.g., a serialized figure) with the fastest JSON engine
+    available.
+
+    :param serialized: the JSON
+    """
+    return orjson.loads(serialized) if orjson else json.loads(serialized)
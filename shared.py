@@ -0,0 +1,116 @@
+import fcntl
+import hashlib
+import os
+from typing import Optional
+
+import pyarrow as pa
+
+import constants
+from datasets import Dataset
+
+
+class SharedStore:
+    """
+    A directory of prepared datasets in the Arrow IPC format that every
+    worker process memory-maps, so the numeric columns are backed by the
+    same pages of the page cache rather than copied into each worker.
+
+    One worker at a time holds the leader lock and publishes new versions;
+    the rest read whichever version is current. A version is written to
+    its own file before the pointer to it is atomically replaced, so
+    readers only ever see complete versions. The last few versions are
+    kept, so a worker that read the pointer just before it moved on can
+    still map the version it points to.
+
+    :param directory: where the datasets are published (ideally tmpfs)
+    :param keep: the number of versions of each dataset to keep
+    """
+
+    def __init__(self, directory: str = constants.SHARED_DATA_DIR, keep: int = constants.SHARED_DATA_VERSIONS):
+        # Apps reading from different sources never share a directory
+        sources = repr(sorted(constants.DATA_SOURCES.items())).encode()
+        self.directory = os.path.join(directory, hashlib.blake2b(sources, digest_size=8).hexdigest())
+        self.keep = max(1, keep)
+        self._lock_file = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def lead(self) -> bool:
+        """
+        Tries to become (or confirms this process is) the publishing worker.
+        The lock is released when the process exits, so another worker
+        takes over on its next attempt.
+        """
+        if self._lock_file is not None and self._lock_file[0] == os.getpid():
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(self._path("leader.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = (os.getpid(), lock_file)
+        return True
+
+    def current(self, dataset: str) -> Optional[str]:
+        """
+        Reads the version of a dataset that is currently published.
+
+        :param dataset: the name of the dataset (e.g., constants.FITBIT)
+        :return: the version, or None if nothing was published yet
+        """
+        try:
+            with open(self._path(f"{dataset}.current")) as pointer:
+                return pointer.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish(self, dataset: str, value: Dataset):
+        """
+        Writes a version of a dataset and makes it the current one.
+
+        :param dataset: the name of the dataset (e.g., constants.FITBIT)
+        :param value: the prepared dataset
+        """
+        if self.current(dataset) == value.version:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(f"{dataset}-{value.version}.arrow")
+        table = pa.Table.from_pandas(value.frame, preserve_index=False)
+        with pa.OSFile(f"{path}.tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+        with open(self._path(f"{dataset}.current.tmp"), "w") as pointer:
+            pointer.write(value.version)
+        os.replace(self._path(f"{dataset}.current.tmp"), self._path(f"{dataset}.current"))
+
+        # Mappings outlive their files, but a worker that has yet to open an older version needs it
+        versions = sorted(
+            (
+                name for name in os.listdir(self.directory)
+                if name.startswith(f"{dataset}-") and name.endswith(".arrow")
+            ),
+            key=lambda name: os.stat(self._path(name)).st_mtime_ns,
+            reverse=True
+        )
+        for name in versions[self.keep:]:
+            if self._path(name) != path:
+                os.remove(self._path(name))
+
+    def load(self, dataset: str, version: str) -> Dataset:
+        """
+        Maps a published version of a dataset.
+
+        :param dataset: the name of the dataset (e.g., constants.FITBIT)
+        :param version: the version to map
+        """
+        source = pa.memory_map(self._path(f"{dataset}-{version}.arrow"))
+        table = pa.ipc.open_file(source).read_all()
+        # Numeric columns without nulls stay views of the mapped file
+        return Dataset(table.to_pandas(split_blocks=True), version)
+
+
+shared_store = SharedStore() if constants.SHARED_DATA_DIR else None
@@ -0,0 +1,371 @@
+"""
+Data source backends for the dashboard datasets.
+
+Each dataset is read from a location configured in constants.DATA_SOURCES.
+A location can be a remote CSV (http or https URL), a local CSV, or a local
+columnar snapshot (.feather, .arrow, or .parquet). Feather and Arrow
+snapshots are memory-mapped, which makes loading them close to free.
+
+Both CSVs are append-only logs, so CSV sources can also read just the
+bytes added since a previous read (see DataSource.fetch_tail).
+
+Snapshots can be produced from the configured CSVs with:
+
+    python sources.py --output-dir snapshots --format feather
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+from pyarrow import feather
+
+import constants
+import metrics
+
+# The number of bytes before a watermark that must match for a tail read to be trusted
+BOUNDARY_SIZE = 256
+
+SNAPSHOT_FORMATS = {
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".parquet": "parquet",
+}
+
+
+@dataclass
+class Watermark:
+    """
+    Where a read of an append-only CSV stopped.
+
+    :param offset: the byte offset just past the last complete line
+    :param boundary: the bytes immediately before the offset
+    :param columns: the header of the CSV
+    :param trailing_rows: the number of rows parsed from an unterminated last line
+    :param digest: a hash of every byte before the offset, for sources that
+        can afford to check it (see LocalCSVSource)
+    """
+    offset: int
+    boundary: bytes
+    columns: list
+    trailing_rows: int = 0
+    digest: Optional[str] = None
+
+
+@dataclass
+class Payload:
+    """
+    A freshly read dataset along with the validators that identify it.
+
+    When appended is set, the frame holds only the rows that follow the
+    watermark passed to DataSource.fetch_tail.
+    """
+    frame: pd.DataFrame
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    watermark: Optional[Watermark] = None
+    appended: bool = False
+
+
+@metrics.instrument("parse")
+def parse_csv(content: bytes, start: int = 0, columns: Optional[list] = None):
+    """
+    Parses CSV bytes and records where they end.
+
+    :param content: the bytes to parse
+    :param start: the byte offset of the content within the file
+    :param columns: the header, if the content does not start with one
+    :return: the parsed rows and the watermark after them
+    """
+    if columns is None:
+        frame = pd.read_csv(io.BytesIO(content))
+        columns = list(frame.columns)
+    elif content.strip():
+        frame = pd.read_csv(io.BytesIO(content), header=None, names=columns)
+    else:
+        frame = pd.DataFrame(columns=columns)
+    end = content.rfind(b"\n") + 1
+    trailing_rows = 1 if content[end:].strip() else 0
+    watermark = Watermark(
+        start + end,
+        content[max(0, end - BOUNDARY_SIZE):end],
+        columns,
+        trailing_rows
+    )
+    return frame, watermark
+
+
+class DataSource:
+    """
+    The base class for anything that can produce a raw dataset.
+
+    :param location: the URL or path of the dataset
+    """
+
+    def __init__(self, location: str):
+        self.location = location
+
+    def fetch(self, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Payload]:
+        """
+        Reads the dataset unless it is unchanged since the given validators.
+
+        :param etag: the ETag of the copy already held, if any
+        :param last_modified: the Last-Modified value of the copy already held, if any
+        :return: the dataset, or None if it has not changed
+        """
+        raise NotImplementedError
+
+    def fetch_tail(self, etag: Optional[str], last_modified: Optional[str], watermark: Watermark) -> Optional[Payload]:
+        """
+        Reads only what was appended after a watermark. Sources that cannot
+        do so, or that find the bytes before the watermark have changed,
+        fall back to a full read. So do sources whose validators changed
+        without a complete line being appended, since that means a line
+        before the watermark was edited in place.
+
+        :param etag: the ETag of the copy already held
+        :param last_modified: the Last-Modified value of the copy already held
+        :param watermark: where the previous read stopped
+        :return: the new rows (or the whole dataset), or None if it has not changed
+        """
+        return self.fetch(etag, last_modified)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.location!r})"
+
+
+class RemoteCSVSource(DataSource):
+    """
+    A CSV served over HTTP, revalidated with conditional requests.
+
+    :param location: the URL of the CSV
+    :param timeout: the number of seconds to wait on the network
+    """
+
+    def __init__(self, location: str, timeout: float = constants.DATA_FETCH_TIMEOUT):
+        super().__init__(location)
+        self.timeout = timeout
+
+    def _open(self, etag: Optional[str], last_modified: Optional[str], start: int = 0):
+        request = urllib.request.Request(self.location)
+        if etag:
+            request.add_header("If-None-Match", etag)
+        if last_modified:
+            request.add_header("If-Modified-Since", last_modified)
+        if start:
+            request.add_header("Range", f"bytes={start}-")
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as error:
+            if error.code == 304 and (etag or last_modified):
+                return None
+            raise
+
+    def fetch(self, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Payload]:
+        response = self._open(etag, last_modified)
+        if response is None:
+            return None
+        with response:
+            content = response.read()
+        frame, watermark = parse_csv(content)
+        return Payload(
+            frame,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            watermark
+        )
+
+    def fetch_tail(self, etag: Optional[str], last_modified: Optional[str], watermark: Watermark) -> Optional[Payload]:
+        start = watermark.offset - len(watermark.boundary)
+        try:
+            response = self._open(etag, last_modified, start)
+        except urllib.error.HTTPError as error:
+            # The file is now shorter than what we already read
+            if error.code == 416:
+                return self.fetch()
+            raise
+        if response is None:
+            return None
+        with response:
+            content = response.read()
+        # The server ignored the range and sent the whole file
+        if response.status != 206:
+            frame, watermark = parse_csv(content)
+            return Payload(
+                frame,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                watermark
+            )
+        if not content.startswith(watermark.boundary):
+            return self.fetch()
+        frame, tail = parse_csv(
+            content[len(watermark.boundary):],
+            watermark.offset,
+            watermark.columns
+        )
+        if tail.offset == watermark.offset:
+            return self.fetch()
+        return Payload(
+            frame,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            tail,
+            appended=True
+        )
+
+
+class LocalSource(DataSource):
+    """
+    The base class for sources backed by a local file, which are validated
+    by the file's modification time and size.
+    """
+
+    def _validator(self) -> str:
+        stat = os.stat(self.location)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def fetch(self, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Payload]:
+        validator = self._validator()
+        if validator == etag:
+            return None
+        return Payload(self.read(), validator)
+
+    def read(self) -> pd.DataFrame:
+        """
+        Reads the whole file.
+        """
+        raise NotImplementedError
+
+
+class LocalCSVSource(LocalSource):
+    """
+    A CSV on the local filesystem.
+
+    Reading the file is cheap next to parsing it, so tail reads hash
+    everything before the watermark to make sure no earlier line was
+    edited, rather than trusting the bytes just before it.
+    """
+
+    def fetch(self, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Payload]:
+        validator = self._validator()
+        if validator == etag:
+            return None
+        with open(self.location, "rb") as file:
+            content = file.read()
+        frame, watermark = parse_csv(content)
+        watermark.digest = hashlib.sha1(content[:watermark.offset]).hexdigest()
+        return Payload(frame, validator, watermark=watermark)
+
+    def fetch_tail(self, etag: Optional[str], last_modified: Optional[str], watermark: Watermark) -> Optional[Payload]:
+        validator = self._validator()
+        if validator == etag:
+            return None
+        with open(self.location, "rb") as file:
+            content = file.read()
+        digest = hashlib.sha1(content[:watermark.offset])
+        # Also catches a file truncated before the watermark
+        if watermark.digest is None or digest.hexdigest() != watermark.digest:
+            return self.fetch()
+        frame, tail = parse_csv(content[watermark.offset:], watermark.offset, watermark.columns)
+        if tail.offset == watermark.offset:
+            return self.fetch()
+        digest.update(content[watermark.offset:tail.offset])
+        tail.digest = digest.hexdigest()
+        return Payload(frame, validator, watermark=tail, appended=True)
+
+    def read(self) -> pd.DataFrame:
+        return pd.read_csv(self.location)
+
+
+class SnapshotSource(LocalSource):
+    """
+    A columnar snapshot on the local filesystem. Feather and Arrow files
+    are memory-mapped rather than read into a buffer.
+    """
+
+    def read(self) -> pd.DataFrame:
+        _, extension = os.path.splitext(self.location)
+        if SNAPSHOT_FORMATS[extension.lower()] == "parquet":
+            return pd.read_parquet(self.location, memory_map=True)
+        return feather.read_table(self.location, memory_map=True).to_pandas()
+
+
+def create_source(location: str) -> DataSource:
+    """
+    Picks the backend for a location based on its scheme or extension.
+
+    :param location: the URL or path of the dataset
+    """
+    if location.startswith(("http://", "https://")):
+        return RemoteCSVSource(location)
+    _, extension = os.path.splitext(location)
+    if extension.lower() in SNAPSHOT_FORMATS:
+        return SnapshotSource(location)
+    return LocalCSVSource(location)
+
+
+_sources = {}
+
+
+def get_source(dataset: str) -> DataSource:
+    """
+    Retrieves the configured source for a dataset.
+
+    :param dataset: the name of the dataset (e.g., constants.FITBIT)
+    """
+    if dataset not in _sources:
+        _sources[dataset] = create_source(constants.DATA_SOURCES[dataset])
+    return _sources[dataset]
+
+
+def write_snapshot(df: pd.DataFrame, path: str):
+    """
+    Writes a dataset to a columnar snapshot. Feather files are left
+    uncompressed so they can be memory-mapped.
+
+    :param df: the dataset to write
+    :param path: the destination, whose extension picks the format
+    """
+    _, extension = os.path.splitext(path)
+    if SNAPSHOT_FORMATS[extension.lower()] == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(path, compression="uncompressed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Converts the dashboard CSVs into columnar snapshots."
+    )
+    parser.add_argument(
+        "datasets",
+        nargs="*",
+        default=list(constants.DATA_SOURCES),
+        help="the datasets to convert (default: all of them)"
+    )
+    parser.add_argument("--output-dir", default="snapshots")
+    parser.add_argument(
+        "--format",
+        choices=["feather", "parquet"],
+        default="feather"
+    )
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for dataset in args.datasets:
+        payload = get_source(dataset).fetch()
+        payload.frame["Date"] = pd.to_datetime(payload.frame["Date"])
+        path = os.path.join(args.output_dir, f"{dataset}.{args.format}")
+        write_snapshot(payload.frame, path)
+        print(f"Wrote {len(payload.frame):,} rows of {dataset} to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import cache
+from cache import DatasetCache, FigureCache
+from sources import DataSource, Payload
+
+# How long a test lets its threads pile up on a fetch or build in flight
+SETTLE = 0.2
+
+
+def prepare(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(Date=pd.to_datetime(df["Date"]))
+
+
+class FakeSource(DataSource):
+    """
+    A source that counts its fetches and can be held or made to fail.
+    """
+
+    def __init__(self):
+        super().__init__("fake://weightlifting.csv")
+        self.etag = "v1"
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.error = None
+
+    def fetch(self, etag=None, last_modified=None):
+        self.calls.append(etag)
+        self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        if etag == self.etag:
+            return None
+        return Payload(pd.DataFrame({"Date": ["2021-01-01"], "Weight": [len(self.calls)]}), self.etag)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def run_concurrently(function, threads: int = 8):
+    """
+    Calls a function from several threads at once.
+
+    :return: what each call returned or raised
+    """
+    results = [None] * threads
+
+    def call(i):
+        try:
+            results[i] = function()
+        except Exception as error:
+            results[i] = error
+
+    workers = [threading.Thread(target=call, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    return workers, results
+
+
+def test_fresh_entries_are_hits(clock):
+    source = FakeSource()
+    datasets = DatasetCache(ttl=60, incremental=False)
+    first = datasets.get(source, prepare)
+    clock.now += 59
+    assert datasets.get(source, prepare) is first
+    assert source.calls == [None]
+    assert datasets.stats()["hits"] == 1
+
+
+def test_expired_entries_revalidate(clock):
+    source = FakeSource()
+    datasets = DatasetCache(ttl=60, incremental=False)
+    first = datasets.get(source, prepare)
+
+    # Unchanged, so the entry is kept and fresh again
+    clock.now += 61
+    assert datasets.get(source, prepare) is first
+    assert source.calls == [None, "v1"]
+    assert datasets.stats()["not_modified"] == 1
+    assert datasets.get(source, prepare) is first
+    assert len(source.calls) == 2
+
+    # Changed, so it is replaced
+    clock.now += 61
+    source.etag = "v2"
+    second = datasets.get(source, prepare)
+    assert second is not first
+    assert second.frame["Weight"].tolist() == [3]
+    assert datasets.stats()["refreshes"] == 2
+
+
+def test_concurrent_callers_share_a_fetch():
+    source = FakeSource()
+    source.gate.clear()
+    datasets = DatasetCache(incremental=False)
+    workers, results = run_concurrently(lambda: datasets.get(source, prepare))
+    time.sleep(SETTLE)
+    source.gate.set()
+    for worker in workers:
+        worker.join()
+
+    assert source.calls == [None]
+    assert all(result is results[0] for result in results)
+    assert datasets.stats()["misses"] == 1
+
+
+def test_failed_fetch_raises_in_every_waiter():
+    source = FakeSource()
+    source.gate.clear()
+    source.error = OSError("unreachable")
+    datasets = DatasetCache(incremental=False)
+    workers, results = run_concurrently(lambda: datasets.get(source, prepare))
+    time.sleep(SETTLE)
+    source.gate.set()
+    for worker in workers:
+        worker.join()
+
+    assert len(source.calls) == 1
+    assert all(result is source.error for result in results)
+
+    # The failed flight is gone, so the next caller fetches again
+    source.error = None
+    assert datasets.get(source, prepare).frame["Weight"].tolist() == [2]
+    assert len(source.calls) == 2
+
+
+def figure(title: str) -> str:
+    return json.dumps({"data": [], "layout": {"title": title}})
+
+
+def test_figures_are_built_once():
+    figures = FigureCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return figure("a")
+
+    assert figures.get("steps", (), "v1", build) == json.loads(figure("a"))
+    assert figures.get("steps", (), "v1", build) == json.loads(figure("a"))
+    assert len(builds) == 1
+    # A new version of the data is a new figure
+    figures.get("steps", (), "v2", build)
+    assert len(builds) == 2
+    assert figures.stats()["hits"] == 1
+
+
+def test_figures_are_evicted_by_size():
+    size = len(figure("a"))
+    figures = FigureCache(budget=2 * size)
+    for title in ["a", "b"]:
+        figures.get(title, (), "v1", lambda title=title: figure(title))
+    # Used last, so "b" is the least recently used
+    figures.get("a", (), "v1", lambda: figure("a"))
+    figures.get("c", (), "v1", lambda: figure("c"))
+
+    assert figures.contains("a", (), "v1")
+    assert not figures.contains("b", (), "v1")
+    assert figures.contains("c", (), "v1")
+    assert figures.stats()["evictions"] == 1
+    assert figures.stats()["bytes"] == 2 * size
+
+    # Figures over the whole budget are served but not kept
+    figures.get("big", (), "v1", lambda: figure("b" * 3 * size))
+    assert not figures.contains("big", (), "v1")
+    assert figures.stats()["entries"] == 2
+
+
+def test_concurrent_figure_requests_share_a_build():
+    figures = FigureCache()
+    gate = threading.Event()
+    builds = []
+
+    def build():
+        builds.append(1)
+        gate.wait()
+        return figure("a")
+
+    workers, results = run_concurrently(lambda: figures.get("steps", (), "v1", build))
+    time.sleep(SETTLE)
+    gate.set()
+    for worker in workers:
+        worker.join()
+
+    assert len(builds) == 1
+    assert all(result == json.loads(figure("a")) for result in results)
+
+
+def test_failed_figure_build_leaves_no_flight():
+    figures = FigureCache()
+
+    def build():
+        raise ValueError("no data")
+
+    with pytest.raises(ValueError):
+        figures.get("steps", (), "v1", build)
+    assert not figures.contains("steps", (), "v1")
+    assert figures.get("steps", (), "v1", lambda: figure("a")) == json.loads(figure("a"))
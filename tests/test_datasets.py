@@ -0,0 +1,36 @@
+import pandas as pd
+
+import constants
+import utils
+from datasets import Dataset
+
+RAW = pd.DataFrame({
+    "Date": ["2021-01-01", "2021-01-01", "2021-01-02", "2021-01-03"],
+    "Muscle Groups": ["Legs", "Back", "Legs", "Chest"],
+    "Exercise": ["Squat", "Deadlift", "Squat", "Bench Press"],
+    "Weight": [100.0, 150.0, 105.0, 80.0],
+    "Reps": [5, 5, 5, 8],
+    "Sets": [3, 1, 3, 3],
+    "Total Reps": [15, 5, 15, 24],
+    "Per Arm": [False, False, False, False],
+    "Difficulty": [3, 4, 3, 2],
+})
+
+
+def prepare(raw: pd.DataFrame) -> pd.DataFrame:
+    return utils.prepare_data(constants.WEIGHTLIFTING, raw.reset_index(drop=True))
+
+
+def test_version_depends_only_on_rows():
+    full = Dataset(prepare(RAW))
+    appended = Dataset(prepare(RAW.iloc[:2])).extend(prepare(RAW.iloc[2:]))
+    assert appended.version == full.version
+
+
+def test_version_after_replacing_trailing_rows():
+    full = Dataset(prepare(RAW))
+    # e.g., an unterminated last line that was completed
+    partial = RAW.iloc[:3].assign(Weight=[100.0, 150.0, 10.0])
+    replaced = Dataset(prepare(partial)).extend(prepare(RAW.iloc[2:]), drop=1)
+    assert replaced.version == full.version
+    assert Dataset(prepare(partial)).version != full.version
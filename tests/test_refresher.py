@@ -0,0 +1,28 @@
+import os
+import threading
+
+import pandas as pd
+
+import constants
+from datasets import Dataset
+from refresher import Refresher
+
+
+def test_datasets_are_not_shared():
+    first, second = Refresher(store=None), Refresher(store=None)
+    first.datasets.remove(constants.FITBIT)
+    assert second.datasets == list(constants.DATA_SOURCES)
+
+
+def test_start_runs_the_first_round():
+    fetched = threading.Event()
+
+    def fetch(dataset, max_age=None):
+        fetched.set()
+        return Dataset(pd.DataFrame({"Date": pd.to_datetime(["2021-01-01"])}))
+
+    refresher = Refresher(interval=3600, datasets=[constants.FITBIT], store=None)
+    refresher.start(fetch)
+    # Before any request asks for the dataset
+    assert fetched.wait(5)
+    assert refresher._pid == os.getpid()
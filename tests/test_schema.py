@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import constants
+import schema
+import utils
+
+
+def weightlifting(**columns) -> pd.DataFrame:
+    rows = {
+        "Date": ["2021-01-01", "2021-01-02", "2021-01-03"],
+        "Muscle Groups": ["Legs", "Back", "Legs"],
+        "Exercise": ["Squat", "Deadlift", "Squat"],
+        "Weight": [100.0, 150.0, 105.0],
+        "Reps": [5, 5, 5],
+        "Sets": [3, 1, 3],
+        "Total Reps": [15, 5, 15],
+        "Per Arm": [False, False, False],
+        "Difficulty": [3, 4, 3],
+    }
+    rows.update(columns)
+    return pd.DataFrame(rows)
+
+
+def test_blank_counts_are_missing():
+    raw = weightlifting(Reps=[5, np.nan, 5], Difficulty=[3, 4, np.nan])
+    df = utils.prepare_data(constants.WEIGHTLIFTING, raw)
+
+    assert len(df) == 3
+    assert str(df["Reps"].dtype) == "Int16"
+    assert df["Reps"].isna().tolist() == [False, True, False]
+    assert df["Difficulty"].isna().tolist() == [False, False, True]
+    # Values derived from a blank count are missing too
+    assert np.isnan(df["Projected 1RM"][1])
+    assert df["Projected 1RM"][0] == pytest.approx(100 * (1 + 5 / 30))
+
+
+def test_blank_steps_are_missing():
+    raw = pd.DataFrame({
+        "Date": ["2021-01-01", "2021-01-02"],
+        "Steps": [8000, np.nan],
+        "Weight": [np.nan, 80.0],
+        "Total Sleep (minutes)": [420.0, 400.0],
+        "Resting Heart Rate": [60.0, 61.0],
+    })
+    df = utils.prepare_data(constants.FITBIT, raw)
+
+    assert len(df) == 2
+    assert df["Steps"].isna().tolist() == [False, True]
+    assert df["Weight"][1] == 80.0
+
+
+@pytest.mark.parametrize("reps", [[5, 5.5, 5], [5, "five", 5], [5, 2**16, 5]])
+def test_malformed_counts_are_rejected(reps):
+    with pytest.raises(schema.SchemaError, match="Reps"):
+        schema.apply_schema(constants.WEIGHTLIFTING, weightlifting(Reps=reps))
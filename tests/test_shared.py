@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import constants
+import shared
+from datasets import Dataset
+
+pytest.importorskip("pyarrow")
+
+
+def dataset(value: float) -> Dataset:
+    return Dataset(pd.DataFrame({"Date": pd.date_range("2021-01-01", periods=3), "Weight": np.full(3, value)}))
+
+
+@pytest.mark.skipif("SHARED_DATA_DIR" in os.environ, reason="the shared store is configured")
+def test_disabled_by_default():
+    assert shared.shared_store is None
+
+
+def test_publish_and_load(tmp_path):
+    store = shared.SharedStore(str(tmp_path))
+    value = dataset(1.0)
+    assert store.current(constants.FITBIT) is None
+    store.publish(constants.FITBIT, value)
+
+    assert store.current(constants.FITBIT) == value.version
+    loaded = store.load(constants.FITBIT, value.version)
+    pd.testing.assert_frame_equal(loaded.frame, value.frame)
+    assert loaded.version == value.version
+
+
+def test_keeps_the_last_versions(tmp_path):
+    store = shared.SharedStore(str(tmp_path), keep=2)
+    values = [dataset(float(i)) for i in range(4)]
+    for value in values:
+        store.publish(constants.FITBIT, value)
+
+    # A worker that read the pointer before the last publish can still map its version
+    assert store.load(constants.FITBIT, values[2].version).frame["Weight"][0] == 2.0
+    assert store.load(constants.FITBIT, values[3].version).frame["Weight"][0] == 3.0
+    with pytest.raises(FileNotFoundError):
+        store.load(constants.FITBIT, values[1].version)
+    assert store.current(constants.FITBIT) == values[3].version
+
+
+def test_mapped_versions_outlive_their_files(tmp_path):
+    store = shared.SharedStore(str(tmp_path), keep=1)
+    first = dataset(1.0)
+    store.publish(constants.FITBIT, first)
+    mapped = store.load(constants.FITBIT, first.version)
+    store.publish(constants.FITBIT, dataset(2.0))
+
+    assert mapped.frame["Weight"].tolist() == [1.0, 1.0, 1.0]
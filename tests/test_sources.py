@@ -0,0 +1,206 @@
+import hashlib
+import http.server
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from cache import DatasetCache
+from sources import LocalCSVSource, RemoteCSVSource
+
+HEADER = "Date,Exercise,Weight\n"
+# Longer than sources.BOUNDARY_SIZE, so tail reads start past the header
+ROWS = [f"{day:%Y-%m-%d},Squat,{100 + day.day}\n" for day in pd.date_range("2021-01-01", periods=30)]
+
+
+def prepare(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(Date=pd.to_datetime(df["Date"]))
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the files of a directory with ETags, conditional requests, and
+    open-ended byte ranges, like the CDNs the remote sources live on.
+    """
+    directory = None
+
+    def do_GET(self):
+        with open(os.path.join(self.directory, self.path.lstrip("/")), "rb") as file:
+            data = file.read()
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        byte_range = self.headers.get("Range")
+        if byte_range:
+            start = int(byte_range.split("=")[1].rstrip("-"))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = data[start:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "weightlifting.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    return path
+
+
+@pytest.fixture(params=["local", "remote"])
+def source(request, csv_path):
+    if request.param == "local":
+        yield LocalCSVSource(str(csv_path))
+        return
+    handler = type("Handler", (RangeHandler,), {"directory": str(csv_path.parent)})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield RemoteCSVSource(f"http://127.0.0.1:{server.server_port}/{csv_path.name}")
+    server.shutdown()
+    server.server_close()
+
+
+def write(path, content: str):
+    """
+    Rewrites a file and moves its mtime forward, so that local validators
+    change even within the filesystem's timestamp resolution.
+    """
+    mtime = path.stat().st_mtime_ns
+    path.write_text(content)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+def expected(content: str) -> pd.DataFrame:
+    lines = content.splitlines()
+    rows = [line.split(",") for line in lines[1:] if line]
+    frame = pd.DataFrame(rows, columns=lines[0].split(","))
+    return prepare(frame.astype({"Weight": "int64"}))
+
+
+def check(cache: DatasetCache, source, content: str):
+    frame = cache.get(source, prepare, max_age=0).frame.reset_index(drop=True)
+    pd.testing.assert_frame_equal(frame, expected(content), check_dtype=False)
+
+
+def test_append(csv_path, source):
+    cache = DatasetCache(incremental=True)
+    check(cache, source, HEADER + "".join(ROWS))
+
+    content = HEADER + "".join(ROWS) + "2021-02-11,Squat,111\n"
+    write(csv_path, content)
+    check(cache, source, content)
+    assert cache.stats()["appends"] == 1
+    assert cache.stats()["reloads"] == 0
+
+
+def test_unchanged(csv_path, source):
+    cache = DatasetCache(incremental=True)
+    check(cache, source, HEADER + "".join(ROWS))
+    check(cache, source, HEADER + "".join(ROWS))
+    assert cache.stats()["not_modified"] == 1
+
+
+@pytest.mark.parametrize("row", [0, len(ROWS) - 1])
+def test_same_length_edit(csv_path, source, row):
+    cache = DatasetCache(incremental=True)
+    check(cache, source, HEADER + "".join(ROWS))
+
+    rows = list(ROWS)
+    rows[row] = rows[row].replace("Squat", "Press")
+    content = HEADER + "".join(rows)
+    write(csv_path, content)
+    check(cache, source, content)
+    assert cache.stats()["reloads"] == 1
+
+
+def test_edit_with_append(csv_path, source):
+    cache = DatasetCache(incremental=True)
+    check(cache, source, HEADER + "".join(ROWS))
+
+    rows = list(ROWS)
+    rows[0] = rows[0].replace("Squat", "Press")
+    content = HEADER + "".join(rows) + "2021-02-11,Squat,111\n"
+    write(csv_path, content)
+    frame = cache.get(source, prepare, max_age=0).frame
+    if isinstance(source, LocalCSVSource):
+        # The prefix hash sees the edit
+        pd.testing.assert_frame_equal(frame.reset_index(drop=True), expected(content), check_dtype=False)
+    else:
+        # A tail read cannot, so the edit waits for the next full reload
+        cache.full_reload_interval = 0
+        check(cache, source, content)
+    assert cache.stats()["reloads"] == 1
+
+
+def test_truncation(csv_path, source):
+    cache = DatasetCache(incremental=True)
+    check(cache, source, HEADER + "".join(ROWS))
+
+    content = HEADER + "".join(ROWS[:3])
+    write(csv_path, content)
+    check(cache, source, content)
+    assert cache.stats()["reloads"] == 1
+
+
+def test_unterminated_last_line(csv_path, source):
+    cache = DatasetCache(incremental=True)
+    content = HEADER + "".join(ROWS) + "2021-02-11,Squat,1"
+    write(csv_path, content)
+    check(cache, source, content)
+
+    # The partial row grows, but no line is completed
+    content += "1"
+    write(csv_path, content)
+    check(cache, source, content)
+
+    # The row is completed and another one appended
+    content += "1\n2021-02-12,Squat,112\n"
+    write(csv_path, content)
+    check(cache, source, content)
+    assert cache.stats()["appends"] == 1
+
+
+def test_full_reload_unchanged(csv_path, source):
+    cache = DatasetCache(incremental=True, full_reload_interval=0)
+    first = cache.get(source, prepare, max_age=0)
+
+    # Nothing changed since the full read, so the reload is answered with a 304
+    assert cache.get(source, prepare, max_age=0) is first
+    assert cache.stats()["not_modified"] == 1
+    assert cache.stats()["reloads"] == 0
+
+
+def test_full_reload_after_append_keeps_version(csv_path, source):
+    cache = DatasetCache(incremental=True)
+    check(cache, source, HEADER + "".join(ROWS))
+    content = HEADER + "".join(ROWS) + "2021-02-11,Squat,111\n"
+    write(csv_path, content)
+    appended = cache.get(source, prepare, max_age=0)
+    assert cache.stats()["appends"] == 1
+
+    # The file changed since the last full read, but its rows are the ones already appended
+    cache.full_reload_interval = 0
+    assert cache.get(source, prepare, max_age=0) is appended
+    assert cache.stats()["reloads"] == 1
+
+    # And the reload counts as a full read
+    assert cache.get(source, prepare, max_age=0) is appended
+    assert cache.stats()["not_modified"] == 1
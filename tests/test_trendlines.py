@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import trendlines
+
+sm_lowess = pytest.importorskip("statsmodels.nonparametric.smoothers_lowess").lowess
+
+
+def series(n: int, seed: int, noise: float):
+    """
+    A noisy daily-like series with outliers, on regular or irregular x.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(0, n, n)) if seed % 2 else np.arange(n, dtype=np.float64)
+    y = 8000 + 2000 * np.sin(x / (n / 6)) + rng.normal(0, noise, n)
+    outliers = rng.random(n) < 0.03
+    y[outliers] += rng.normal(0, 5 * noise, outliers.sum())
+    return x, y
+
+
+def deviation(x, y, frac: float) -> float:
+    """
+    The largest deviation from statsmodels as a fraction of its curve's range.
+    """
+    expected = sm_lowess(y, x, frac=frac, it=3, delta=0, return_sorted=False)
+    return np.abs(trendlines.lowess(x, y, frac) - expected).max() / np.ptp(expected)
+
+
+@pytest.mark.parametrize("frac", [0.05, 0.2, trendlines.DEFAULT_FRAC])
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_statsmodels_within_budget(frac, seed):
+    # Small enough to be fit at every point
+    x, y = series(1000, seed, [200, 2000, 6000][seed % 3])
+    assert deviation(x, y, frac) < 1e-6
+
+
+@pytest.mark.parametrize("n, frac", [(4300, 0.2), (8000, 0.02), (12000, trendlines.DEFAULT_FRAC)])
+@pytest.mark.parametrize("seed", range(3))
+def test_interpolated_fit_stays_close_to_statsmodels(n, frac, seed):
+    x, y = series(n, seed, [200, 2000, 6000][seed % 3])
+    assert deviation(x, y, frac) < 0.0025
+
+
+def test_short_series():
+    assert trendlines.lowess(np.array([1.0]), np.array([5.0])).tolist() == [5.0]
+    np.testing.assert_allclose(trendlines.lowess(np.array([0.0, 1.0]), np.array([1.0, 3.0])), [1.0, 3.0])
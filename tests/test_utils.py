@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import constants
+import utils
+from datasets import Dataset
+
+
+def weightlifting(rows: list) -> Dataset:
+    raw = pd.DataFrame(rows, columns=["Date", "Muscle Groups", "Exercise", "Weight", "Reps"])
+    raw = raw.assign(**{"Sets": 1, "Total Reps": raw["Reps"], "Per Arm": False, "Difficulty": 3})
+    return Dataset(utils.prepare_data(constants.WEIGHTLIFTING, raw))
+
+
+def test_1rm_figure_is_per_muscle():
+    # Deadlifts are logged under two muscle groups, and only Back lifts heavy
+    dataset = weightlifting([
+        ["2021-01-01", "Legs", "Deadlift", 200.0, 5],
+        ["2021-01-02", "Back", "Deadlift", 300.0, 5],
+        ["2021-01-03", "Legs", "Deadlift", 220.0, 5],
+        ["2021-01-05", "Legs", "Deadlift", 230.0, 5],
+        ["2021-01-06", "Back", "Deadlift", 250.0, 5],
+    ])
+    rows = slice(0, len(dataset.frame))
+
+    legs = utils.build_1rm_figure(dataset, rows, "All Time", "Legs")
+    back = utils.build_1rm_figure(dataset, rows, "All Time", "Back")
+
+    assert len(legs.data) == 1
+    np.testing.assert_allclose(legs.data[0].y, np.array([200.0, 220.0, 230.0]) * 7 / 6)
+    assert len(back.data) == 1
+    np.testing.assert_allclose(back.data[0].y, np.array([300.0, 300.0]) * 7 / 6)
+
+
+@pytest.mark.parametrize("window", ["All Time", "Last 3 Days"])
+def test_1rm_figure_matches_muscle_rows(window):
+    dataset = weightlifting([
+        [f"2021-01-{day:02d}", muscle, "Deadlift", weight, 5]
+        for day, (muscle, weight) in enumerate(
+            [("Legs", 100.0), ("Back", 140.0), ("Legs", 120.0), ("Back", 130.0), ("Legs", 110.0), ("Legs", 125.0)],
+            start=1
+        )
+    ])
+    rows = utils.window_slice(dataset.frame, window, today=pd.Timestamp("2021-01-06").date())
+    legs = dataset.frame.iloc[rows].query("`Muscle Groups` == 'Legs'")
+    expected = legs["Projected 1RM"].cummax()
+
+    figure = utils.build_1rm_figure(dataset, rows, window, "Legs")
+    assert figure.data[0].y[-1] == pytest.approx(expected.iloc[-1])
+    assert set(np.round(figure.data[0].y, 6)) == set(np.round(expected, 6))
+
+
+@pytest.mark.parametrize("window, label", [
+    ("2022-03-01/2022-03-31", "2022-03-01 to 2022-03-31"),
+    ("2022-03-01/", "Since 2022-03-01"),
+    ("/2022-03-31", "Until 2022-03-31"),
+    ("Last Year", "Last Year"),
+    (None, "All Time"),
+])
+def test_describe_window(window, label):
+    assert utils.describe_window(window) == label
+
+
+def test_explicit_range_includes_both_days():
+    df = pd.DataFrame({"Date": pd.date_range("2022-02-27", "2022-04-02")})
+    rows = utils.window_slice(df, "2022-03-01/2022-03-31")
+    assert df["Date"].iloc[rows].dt.strftime("%Y-%m-%d").tolist()[::30] == ["2022-03-01", "2022-03-31"]
+    assert len(df.iloc[rows]) == 31
@@ -1,64 +1,424 @@
 import datetime
+import functools
+import re
 
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from dash import html
-from plotly_calplot import calplot
+import plotly.graph_objects as go
+from dash import html, no_update
+from dash.exceptions import PreventUpdate
 
+import cache
 import constants
+import context
+import derived
+import downsample
+import highlights
+import metrics
+import refresher
+import rollups
+import schema
+import sources
+import trendlines
+from datasets import Dataset
 
 
-def load_data(url: str):
+@metrics.instrument("fetch")
+def load_dataset(dataset: str) -> Dataset:
+    """
+    Retrieves the current version of a dataset, from the background
+    refresher's snapshot if it is running or else from the dataset cache.
+
+    :param dataset: the name of the dataset (e.g., constants.FITBIT)
+    """
+    if refresher.refresher.enabled:
+        return refresher.refresher.get(dataset)
+    return fetch_dataset(dataset)
+
+
+@metrics.instrument("fetch")
+def fetch_dataset(dataset: str, max_age: float = None) -> Dataset:
+    """
+    Retrieves a dataset through the dataset cache, revalidating its source
+    if the cached copy is too old.
+
+    :param dataset: the name of the dataset (e.g., constants.FITBIT)
+    :param max_age: overrides the cache TTL
+    """
+    source = sources.get_source(dataset)
+    return cache.dataset_cache.get(source, lambda df: prepare_data(dataset, df), max_age)
+
+
+@metrics.instrument("fetch")
+def load_data(dataset: str):
     """
     A helper function for getting the data in some decent state. 
+
+    Datasets are shared through the dataset cache, so the returned
+    dataframe must not be modified in place.
+
+    :param dataset: the name of the dataset (e.g., constants.FITBIT)
+    """
+    return load_dataset(dataset).frame
+
+
+@metrics.instrument("parse")
+def prepare_data(dataset: str, df: pd.DataFrame):
+    """
+    Types the columns of a freshly read dataset (see schema.SCHEMAS) and
+    adds the derived columns (see derived.DERIVED).
+
+    :param dataset: the name of the dataset
+    :param df: the raw dataset
+    :raises schema.SchemaError: if any rows are malformed
+    """
+    df = schema.apply_schema(dataset, df)
+    df = derived.add_derived(dataset, df)
+    # Keeping rows in date order lets time_filter slice rather than mask
+    return df.sort_values("Date", kind="stable", ignore_index=True)
+
+
+WINDOW_PATTERN = re.compile(r"last (?:(\w+) )?(day|week|month|year)s?", re.IGNORECASE)
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12
+}
+
+# The rows of the calendar heatmap each year takes up: one per weekday and a gap
+CALENDAR_BAND = 8
+
+
+@functools.lru_cache(maxsize=128)
+def window_bounds(window, today: datetime.date):
+    """
+    Turns a time window into the first and last dates it covers.
+
+    Supported windows are "All Time", "Year to Date", "Last N Days",
+    "Last N Weeks", "Last N Months", and "Last N Years" (N may be a number
+    or a word and may be omitted), as well as explicit ranges given as
+    "YYYY-MM-DD/YYYY-MM-DD" or a (start, end) tuple. Either end of an
+    explicit range may be left empty. Months start on the first of the
+    month, so "Last Three Months" on October 18th starts on August 1st.
+
+    :param window: the time window
+    :param today: the date the window is relative to
+    :return: a (start, end) pair of timestamps, either of which may be None
+    """
+    if window is None or window == "All Time":
+        return None, None
+    if isinstance(window, tuple):
+        start, end = window
+    elif "/" in window:
+        start, end = window.split("/", 1)
+    elif window.lower() == "year to date":
+        return pd.Timestamp(today.year, 1, 1), None
+    else:
+        match = WINDOW_PATTERN.fullmatch(window.strip())
+        if match is None:
+            raise ValueError(f"Unknown time window: {window}")
+        count, unit = match.groups()
+        count = 1 if count is None else NUMBER_WORDS.get(count.lower()) or int(count)
+        unit = unit.lower()
+        if unit == "day":
+            offset = pd.offsets.Day(count)
+        elif unit == "week":
+            offset = pd.DateOffset(weeks=count)
+        elif unit == "month":
+            offset = pd.offsets.MonthBegin(count)
+        else:
+            offset = pd.DateOffset(years=count)
+        return pd.Timestamp(today) - offset, None
+    start = pd.Timestamp(start) if start else None
+    end = pd.Timestamp(end) if end else None
+    return start, end
+
+
+def describe_window(window) -> str:
     """
-    df = pd.read_csv(url)
-    df["Date"] = pd.to_datetime(df["Date"])
-    if url == constants.WEIGHTLIFTING_URL:
-        df["Volume"] = df["Weight"] * df["Total Reps"]
-        df["Projected 1RM"] = df["Weight"] * (1 + (df["Reps"] / 30))
-        df["Per Arm"] = df["Per Arm"].map({True: "Yes", False: "No"})
-    if url == constants.FITBIT_URL:
-        df["Total Sleep (hours)"] = df["Total Sleep (minutes)"] / 60
-        hours, minutes = df["Total Sleep (minutes)"].divmod(60)
-        df["Sleep (readable)"] = hours.astype(str).str.split(".", expand=True)[0] + "h " + minutes.astype(str).str.split(".", expand=True)[0] + "m"
-    return df
+    Labels a time window for display: presets as they are, and explicit
+    ranges by their dates (e.g., "2022-03-01 to 2022-04-01" or "Since
+    2022-03-01").
 
+    :param window: the time window (see window_bounds)
+    """
+    if window is None:
+        return "All Time"
+    if isinstance(window, tuple):
+        start, end = window
+    elif "/" in window:
+        start, end = window.split("/", 1)
+    else:
+        return window
+    start = pd.Timestamp(start).date().isoformat() if start else None
+    end = pd.Timestamp(end).date().isoformat() if end else None
+    if start and end:
+        return f"{start} to {end}"
+    if start:
+        return f"Since {start}"
+    if end:
+        return f"Until {end}"
+    return "All Time"
+
+
+@metrics.instrument("filter")
+def window_slice(df: pd.DataFrame, window: str, today: datetime.date = None) -> slice:
+    """
+    Finds the rows of a date-sorted dataframe that fall in a time window.
+    See window_bounds for supported windows.
 
+    :param df: a dataframe sorted by its "Date" column
+    :param window: the time window to filter by
+    :param today: the date the window is relative to, if not today
+    :return: the positions of the rows in the window
+    """
+    start, end = window_bounds(window, today or datetime.date.today())
+    dates = df["Date"]
+    first = 0 if start is None else int(dates.searchsorted(start, side="left"))
+    # Explicit end dates include the whole day
+    last = len(df) if end is None else int(dates.searchsorted(end + pd.offsets.Day(1), side="left"))
+    return slice(first, last)
+
+
+def get_window_context(dataset: Dataset, window: str) -> context.WindowContext:
+    """
+    Retrieves the shared context of a time window of the weightlifting
+    dataset (see context.WindowContext).
+
+    :param dataset: the weightlifting dataset
+    :param window: the time window
+    """
+    return context.get_context(dataset, window_slice(dataset.frame, window))
+
+
+@metrics.instrument("filter")
 def time_filter(df: pd.DataFrame, window: str):
     """
     A help function to filter the dataframe by time window.
+
+    The dataframe must be sorted by date, which lets the window be found
+    with a binary search and returned as a slice of the original rows
+    rather than a masked copy. See window_bounds for supported windows.
+
+    :param df: a dataframe sorted by its "Date" column
+    :param window: the time window to filter by
+    """
+    rows = window_slice(df, window)
+    if rows.start == 0 and rows.stop == len(df):
+        return df
+    return df.iloc[rows]
+
+
+@metrics.instrument("figure")
+def plot_muscle_volume(muscle_df: pd.DataFrame, exercises: list, window: str):
+    """
+    Plots the LOWESS trend of lift volume for each exercise of a muscle group.
+
+    :param muscle_df: the sets of a single muscle group within the time window
+    :param exercises: the exercises of the muscle group, in display order
+    :param window: the time window, for the title
+    """
+    figure = px.scatter(
+        schema.with_labels(muscle_df),
+        x="Date",
+        y="Volume",
+        color="Exercise",
+        title=f"Lift Volume by Muscle Group: {describe_window(window)}",
+        category_orders={"Exercise": exercises},
+        symbol="Per Arm"
+    )
+    trends = [trendlines.lowess_trendline(t) for t in figure.data]
+    figure.data = []
+    figure.add_traces(trends)
+    figure.update_traces(showlegend=True)
+    return figure
+
+
+@metrics.instrument("figure")
+def plot_muscle_1rm(peaks_df: pd.DataFrame, exercises: list, window: str):
+    """
+    Plots the running maximum projected 1RM for each exercise of a muscle group.
+
+    :param peaks_df: the rows where the running maximum of a single muscle
+        group changes (see trendlines.expanding_max)
+    :param exercises: the exercises of the muscle group, in display order
+    :param window: the time window, for the title
     """
-    curr = df
-    if window == "Last Three Months":
-        curr = df[
-            df["Date"] >= datetime.date.today() - pd.offsets.MonthBegin(3)
+    figure = px.line(
+        schema.with_labels(peaks_df),
+        x="Date",
+        y="Projected 1RM",
+        color="Exercise",
+        title=f"Projected 1RM by Muscle Group: {describe_window(window)}",
+        category_orders={"Exercise": exercises},
+        symbol="Per Arm",
+        line_shape="hv"
+    )
+    figure.update_traces(mode="lines", showlegend=True)
+    figure.for_each_trace(lambda trace: trace.update(
+        hovertemplate="<b>Expanding max trendline</b><br><br>"
+        + trace.hovertemplate.replace("%{y}", "%{y} <b>(trend)</b>")
+    ))
+    return figure
+
+
+@metrics.instrument("figure")
+def plot_daily_overview(exercise_groups: pd.DataFrame, column: str, label: str):
+    """
+    Plots a daily rollup of every exercise.
+
+    :param exercise_groups: the daily_exercise rollup within the time window
+    :param column: the column to plot
+    :param label: the axis label for the column
+    """
+    return px.scatter(
+        schema.with_labels(exercise_groups),
+        x="Date",
+        y=column,
+        color="Exercise",
+        labels={column: label}
+    )
+
+
+@metrics.instrument("figure")
+def plot_daily_points(df: pd.DataFrame, column: str, hover_data: list = None):
+    """
+    Plots every day of a Fitbit metric. The browser filters the points to
+    the selected time window (see create_overview_store).
+
+    :param df: the Fitbit data, without missing values
+    :param column: the column to plot
+    :param hover_data: any extra columns to show on hover
+    """
+    return px.scatter(
+        df,
+        x="Date",
+        y=column,
+        hover_data=hover_data,
+        render_mode="webgl" if len(df) > constants.WEBGL_THRESHOLD else "svg"
+    )
+
+
+@metrics.instrument("figure")
+def plot_daily_trend(df: pd.DataFrame, column: str):
+    """
+    Fits a tight LOWESS trendline to a daily Fitbit metric. The trendline
+    is fit to every point of the window but downsampled to at most
+    constants.DOWNSAMPLE_POINTS points.
+
+    :param df: the Fitbit data within the time window, without missing values
+    :param column: the column to smooth
+    :return: the trendline trace
+    """
+    trend = trendlines.lowess_trendline(
+        px.scatter(df, x="Date", y=column).data[0],
+        frac=0.05,
+        line_color=px.colors.qualitative.G10[8]
+    )
+    trend_x, trend_y = np.asarray(trend.x, dtype="datetime64[ns]"), np.asarray(trend.y)
+    points = downsample.lttb(trend_x, trend_y, constants.DOWNSAMPLE_POINTS)
+    return trend.update(x=pd.Series(trend_x[points]), y=trend_y[points])
+
+
+@metrics.instrument("figure")
+def create_overview_store(today: datetime.date) -> dict:
+    """
+    Collects everything the browser needs to show the overview plots for
+    any of constants.TIME_WINDOWS: each figure with the data of every
+    day, the trendlines that depend on the window, and the bounds of each
+    window. Window changes and zooms are then applied by clientside
+    callbacks (see assets/overviews.js) without a round trip.
+
+    :param today: the date the windows are relative to
+    :return: the data of the "overview-figures" store
+    """
+    weightlifting = load_dataset(constants.WEIGHTLIFTING)
+    fitbit = load_dataset(constants.FITBIT)
+    exercise_groups = rollups.get_rollup(weightlifting, "daily_exercise")
+
+    windows = {}
+    for window in constants.TIME_WINDOWS:
+        start, end = window_bounds(window, today)
+        # The end is exclusive, so explicit end dates include the whole day
+        windows[window] = [
+            None if start is None else start.isoformat(),
+            None if end is None else (end + pd.offsets.Day(1)).isoformat()
         ]
-    return curr
+
+    def daily(column: str, hover_data: list = None) -> dict:
+        df = fitbit.frame.dropna(subset=[column])
+        trends = {}
+        for window in constants.TIME_WINDOWS:
+            rows = window_slice(df, window, today)
+            trends[window] = cache.figure_cache.get(
+                f"{column}_trend",
+                (rows.start, rows.stop),
+                fitbit.version,
+                lambda: {"data": [plot_daily_trend(df.iloc[rows], column)]}
+            )["data"][0]
+        return {
+            "figure": cache.figure_cache.get(
+                column, (), fitbit.version, lambda: plot_daily_points(df, column, hover_data)),
+            "trends": trends
+        }
+
+    return {
+        "windows": windows,
+        "points": constants.DOWNSAMPLE_POINTS,
+        "webgl": constants.WEBGL_THRESHOLD,
+        "figures": {
+            "volume-overview": {
+                "figure": cache.figure_cache.get(
+                    "volume_overview",
+                    (),
+                    weightlifting.version,
+                    lambda: plot_daily_overview(exercise_groups, "Volume", "Volume (lbs)")
+                )
+            },
+            "projected-1rm-overview": {
+                "figure": cache.figure_cache.get(
+                    "1rm_overview",
+                    (),
+                    weightlifting.version,
+                    lambda: plot_daily_overview(
+                        exercise_groups, "Projected 1RM", "Maximum Projected 1RM (lbs)")
+                )
+            },
+            "steps-overview": daily("Steps"),
+            "weight-overview": daily("Weight"),
+            "sleep-overview": daily("Total Sleep (hours)", hover_data=["Sleep (readable)"]),
+            # Binned by the browser from the weights of the weight overview
+            "weight-histogram": {
+                "figure": cache.figure_cache.get(
+                    "weight_histogram",
+                    (),
+                    fitbit.version,
+                    lambda: px.histogram(fitbit.frame.head(0), x="Weight")
+                ),
+                "source": "weight-overview"
+            },
+        }
+    }
 
 
-def plot_exercise_sets_reps(df: pd.DataFrame, window: str, muscle: str, exercise: str):
+@metrics.instrument("figure")
+def plot_exercise_sets_reps(exercise_df: pd.DataFrame, reps: list):
     """
-    :param df: the complete dataset
-    :param window: the time window to filter by
-    :param muscle: the muscle group to filter by
-    :param exercise: the exercise to filter by
+    :param exercise_df: the sets of a single exercise within the time window
+    :param reps: every rep count in the dataset, so colors are constant between plots
     """
-    temp = time_filter(df, window)
-    muscle_df = temp[temp["Muscle Groups"] == muscle]
-    exercise_df = muscle_df[muscle_df["Exercise"] == exercise]
     figure = px.line(
-        exercise_df,
+        schema.with_labels(exercise_df),
         x="Date",
         y="Weight",
         facet_col="Sets",
         color="Reps",
         category_orders={
             # Ensures only existing sets are shown
-            "Sets": sorted(exercise_df["Sets"].unique()),
+            "Sets": sorted(exercise_df["Sets"].dropna().unique()),
             # Ensures colors are constant between plots
-            "Reps": sorted(df["Reps"].unique()),
+            "Reps": reps,
         },
         markers=True,
         symbol="Per Arm",
@@ -66,23 +426,22 @@ def plot_exercise_sets_reps(df: pd.DataFrame, window: str, muscle: str, exercise
     return figure
 
 
-def create_recent_exercises_table(df: pd.DataFrame, muscle: str, exercise: str):
+@metrics.instrument("figure")
+def create_recent_exercises_table(exercise_df: pd.DataFrame):
     """
     Creates a nice table of the recent sets by reps for a given exercise. 
 
-    :param df: the complete dataset
-    :param muscle: the muscle group to filter by
-    :param exercise: the exercise to filter by
+    :param exercise_df: every set of a single exercise
     """
-    temp = df[(df["Muscle Groups"] == muscle) & (
-        df["Exercise"] == exercise)].groupby(["Sets", "Reps"]).last()
-    temp.drop(df.columns.difference(
+    temp = schema.with_labels(exercise_df).groupby(["Sets", "Reps"]).last()
+    temp.drop(exercise_df.columns.difference(
         ["Sets", "Reps", "Per Arm", "Weight", "Difficulty"]), axis=1, inplace=True)
     table = dbc.Table.from_dataframe(
         temp, striped=True, bordered=True, hover=True, index=True)
     return table
 
 
+@metrics.instrument("figure")
 def create_video_description_row(exercise_constants: dict):
     """
     Creates a row that contains the exercise video and its description.
@@ -109,18 +468,134 @@ def create_video_description_row(exercise_constants: dict):
         )
 
 
+@metrics.instrument("figure")
+def create_lazy_accordion(panel: str, muscles: list, active_item: str = None):
+    """
+    Creates the items of an accordion with one empty panel per muscle group,
+    so only the headers are sent until an item is opened (see
+    render_lazy_panels).
+
+    :param panel: the type of the panel ids, e.g. {"type": panel, "muscle": muscle}
+    :param muscles: the muscle groups, in display order
+    :param active_item: the currently open item, kept open if it still exists
+    :return: the accordion items and the item to keep open
+    """
+    items = [
+        dbc.AccordionItem(
+            html.Div(id={"type": panel, "muscle": muscle}),
+            title=muscle,
+            item_id=muscle
+        )
+        for muscle in muscles
+    ]
+    return items, active_item if active_item in muscles else None
+
+
+@metrics.instrument("figure")
+def render_lazy_panels(active_item: str, panels: list, contents: list, render):
+    """
+    Fills in the panel of the open accordion item, leaving every other
+    panel untouched. Panels that were already rendered are kept as is.
+
+    :param active_item: the item_id of the open accordion item
+    :param panels: the ids of every panel in the accordion
+    :param contents: the current children of every panel
+    :param render: a function from a muscle group to the children of its panel
+    """
+    outputs = [
+        render(panel["muscle"]) if panel["muscle"] == active_item and not content else no_update
+        for panel, content in zip(panels, contents)
+    ]
+    if all(output is no_update for output in outputs):
+        raise PreventUpdate
+    return outputs
+
+
+@metrics.instrument("figure")
+def build_volume_figure(dataset: Dataset, rows: slice, window: str, muscle: str):
+    """
+    Builds the lift volume figure of a muscle group's accordion panel.
+
+    :param dataset: the weightlifting dataset
+    :param rows: the rows of the time window (see window_slice)
+    :param window: the time window, for the title
+    :param muscle: the muscle group
+    """
+    window_context = context.get_context(dataset, rows)
+    return plot_muscle_volume(window_context.frame(muscle), window_context.exercises(muscle), window)
+
+
+@metrics.instrument("figure")
+def build_1rm_figure(dataset: Dataset, rows: slice, window: str, muscle: str):
+    """
+    Builds the projected 1RM figure of a muscle group's accordion panel.
+
+    :param dataset: the weightlifting dataset
+    :param rows: the rows of the time window (see window_slice)
+    :param window: the time window, for the title
+    :param muscle: the muscle group
+    """
+    window_context = context.get_context(dataset, rows)
+    peaks, keep = window_context.expanding_max("Projected 1RM", ["Muscle Groups", "Exercise", "Per Arm"])
+    positions = window_context.positions(muscle)
+    positions = positions[keep[positions - rows.start]]
+    peaks_df = (
+        dataset.frame[["Date", "Exercise", "Per Arm"]]
+        .take(positions)
+        .assign(**{"Projected 1RM": peaks[positions - rows.start]})
+        .dropna(subset=["Projected 1RM"])
+    )
+    return plot_muscle_1rm(peaks_df, window_context.exercises(muscle), window)
+
+
+@metrics.instrument("figure")
+def build_sets_reps_figure(dataset: Dataset, rows: slice, muscle: str, exercise: str):
+    """
+    Builds the sets and reps figure of an exercise's tab.
+
+    :param dataset: the weightlifting dataset
+    :param rows: the rows of the time window (see window_slice)
+    :param muscle: the muscle group of the exercise
+    :param exercise: the exercise
+    """
+    reps = dataset.derive("reps", lambda df: sorted(df["Reps"].dropna().unique()))
+    return plot_exercise_sets_reps(context.get_context(dataset, rows).frame(muscle, exercise), reps)
+
+
+@metrics.instrument("figure")
 def create_fatique_plot():
+    dataset = load_dataset(constants.WEIGHTLIFTING)
+    today = datetime.date.today()
+    return cache.figure_cache.get(
+        "fatigue",
+        (today,),
+        dataset.version,
+        lambda: plot_fatigue(dataset, today)
+    )
+
+
+@metrics.instrument("figure")
+def plot_fatigue(dataset: Dataset, today: datetime.date):
+    """
+    Plots the ratio of volume to average projected 1RM of each muscle
+    group over the last two days.
+
+    :param dataset: the weightlifting dataset
+    :param today: the date the two days lead up to
+    """
     # Load data
-    df = load_data(constants.WEIGHTLIFTING_URL)
+    daily = rollups.get_rollup(dataset, "daily_muscle")
 
     # Workout plots
     fatigue = (
-        df[df["Date"] >= datetime.date.today() - pd.offsets.Day(2)]
-        .groupby("Muscle Groups")
-        .agg({"Volume": "sum", "Projected 1RM": "mean"})
+        daily[daily["Date"] >= today - pd.offsets.Day(2)]
+        .groupby("Muscle Groups", observed=True)
+        .agg({"Volume": "sum", "Projected 1RM Total": "sum", "Sets": "sum"})
     )
+    fatigue["Projected 1RM"] = fatigue["Projected 1RM Total"] / fatigue["Sets"]
+    fatigue = fatigue[["Volume", "Projected 1RM"]]
 
-    missing = set(df["Muscle Groups"].unique()) - set(fatigue.index)
+    missing = set(daily["Muscle Groups"].unique()) - set(fatigue.index)
     fatigue["Cumulative Volume / Average Project 1RM"] = (
         fatigue["Volume"] / fatigue["Projected 1RM"]
     )
@@ -133,44 +608,133 @@ def create_fatique_plot():
     return px.bar(fatigue, y="Cumulative Volume / Average Project 1RM")
 
 
-def create_calendar_plot():
-    df = load_data(constants.WEIGHTLIFTING_URL)
-    days = df.groupby("Date").agg({"Exercise": "count"}).reset_index()
-    fig = calplot(
-        days,
-        x="Date",
-        y="Exercise",
+@metrics.instrument("figure")
+def create_calendar_plot(window: str):
+    """
+    Retrieves the workout calendar of a time window.
+
+    :param window: the time window
+    """
+    dataset = load_dataset(constants.WEIGHTLIFTING)
+    today = datetime.date.today()
+    days = rollups.get_rollup(dataset, "daily_workouts")
+    rows = window_slice(days, window, today)
+    start, end = window_bounds(window, today)
+    # Every day of the window is shown, up to today for open windows
+    first = start or (days["Date"].iloc[0] if len(days) else today)
+    last = end or today
+    return cache.figure_cache.get(
+        "calendar",
+        (rows.start, rows.stop, pd.Timestamp(first), pd.Timestamp(last)),
+        dataset.version,
+        lambda: plot_calendar(days.iloc[rows], first, last)
+    )
+
+
+@metrics.instrument("figure")
+def plot_calendar(days: pd.DataFrame, first: datetime.date, last: datetime.date):
+    """
+    Plots a calendar heatmap of the number of exercises done each day,
+    with a row of weeks per weekday and a band of rows per year.
+
+    Every day is placed in the grid at once: its year picks the band, its
+    weekday the row, and its week of the year the column. The whole grid
+    is a single heatmap, so the cost barely grows with years of history.
+    Each cell carries its date, so clicking it can show that day's sets.
+
+    :param days: the daily_workouts rollup within the time window
+    :param first: the first day to show
+    :param last: the last day to show
+    """
+    first = np.datetime64(pd.Timestamp(first).date(), "D")
+    last = np.datetime64(pd.Timestamp(last).date(), "D")
+    dates = np.arange(first, max(first, last) + 1)
+    counts = np.zeros(len(dates))
+    offsets = (days["Date"].to_numpy().astype("datetime64[D]") - first).astype(np.int64)
+    inside = (offsets >= 0) & (offsets < len(dates))
+    counts[offsets[inside]] = days["Exercise"].to_numpy()[inside]
+
+    # 1970-01-01 was a Thursday, so this makes Monday 0
+    weekdays = (dates.astype(np.int64) + 3) % 7
+    years = dates.astype("datetime64[Y]")
+    new_years = years.astype("datetime64[D]")
+    weeks = ((dates - new_years).astype(np.int64) + (new_years.astype(np.int64) + 3) % 7) // 7
+    bands = (years - years[0]).astype(np.int64)
+    grid_rows = bands * CALENDAR_BAND + weekdays
+
+    shape = (bands[-1] * CALENDAR_BAND + 7, 54)
+    z = np.full(shape, np.nan)
+    z[grid_rows, weeks] = counts
+    cells = np.full(shape, None, dtype=object)
+    cells[grid_rows, weeks] = np.datetime_as_string(dates, unit="D")
+
+    fig = go.Figure(go.Heatmap(
+        z=z,
+        customdata=cells,
+        hovertemplate="%{customdata}<br>%{z} exercises<extra></extra>",
+        hoverongaps=False,
         colorscale="greens",
-        years_title=True,
-        showscale=True
+        colorbar={"title": "Exercises"},
+        xgap=2,
+        ygap=2
+    ))
+    year_labels = np.arange(years[0], years[-1] + 1)
+    fig.update_layout(
+        height=80 + 20 * shape[0],
+        plot_bgcolor="white",
+        xaxis={
+            "tickvals": [(pd.Timestamp(2001, month, 1).dayofyear - 1) / 7 for month in range(1, 13)],
+            "ticktext": [pd.Timestamp(2001, month, 1).strftime("%b") for month in range(1, 13)],
+            "showgrid": False,
+            "zeroline": False
+        },
+        yaxis={
+            "tickvals": np.arange(len(year_labels)) * CALENDAR_BAND + 3,
+            "ticktext": [str(year) for year in year_labels],
+            "autorange": "reversed",
+            "showgrid": False,
+            "zeroline": False
+        }
     )
-    fig.update_layout(width=None)
     return fig
 
 
+@metrics.instrument("figure")
+def create_workout_day_table(day_df: pd.DataFrame, day: str):
+    """
+    Creates a table of every set done on a day.
+
+    :param day_df: the sets of the day
+    :param day: the day, as shown above the table
+    """
+    columns = ["Muscle Groups", "Exercise", "Weight", "Reps", "Sets", "Per Arm", "Difficulty"]
+    return [
+        html.H4(day),
+        dbc.Table.from_dataframe(
+            schema.with_labels(day_df)[columns], striped=True, bordered=True, hover=True)
+    ]
+
+
+@metrics.instrument("aggregate")
 def get_number_of_records() -> int:
-    df = load_data(constants.FITBIT_URL)
-    return len(df)
+    return highlights.get_highlights(load_dataset(constants.FITBIT)).records
 
 
-def get_highlights(column: str) -> dict:
-    df = load_data(constants.FITBIT_URL)
-    return {
-        "min": df[df[column] == df[column].min()],
-        "max": df[df[column] == df[column].max()],
-        "mean": df[column].mean(),
-        "median": df[column].median(),
-        "mode": df[column].mode()[0]
-    }
+@metrics.instrument("aggregate")
+def get_highlights(column: str) -> highlights.ColumnStats:
+    return highlights.get_highlights(load_dataset(constants.FITBIT)).columns[column]
 
 
+@metrics.instrument("figure")
 def create_highlight_card(column: str, units: str, title: str):
-    highlights = get_highlights(column)
-    min_df: pd.DataFrame = highlights['min']
-    max_df: pd.DataFrame = highlights['max']
-    mean: float = highlights['mean']
-    median: float = highlights['median']
-    mode: float = highlights['mode']
+    stats = get_highlights(column)
+
+    def format_value(value):
+        return f"{int(value):,} {units}" if value is not None else "N/A"
+
+    def format_date(date):
+        return f"{date.date()}" if date is not None else "N/A"
+
     return dbc.Card(
         [
             dbc.CardHeader(html.Center(title)),
@@ -182,10 +746,10 @@ def create_highlight_card(column: str, units: str, title: str):
                                 html.Center(html.Strong("Minimum"))
                             ]),
                             dbc.ListGroup([
-                                html.Center(f"{pd.to_datetime(min_df['Date'].values[0]).date()}")
+                                html.Center(format_date(stats.minimum_date))
                             ]),
                             dbc.ListGroup([
-                                html.Center(f"{int(min_df[column]):,} {units}")
+                                html.Center(format_value(stats.minimum))
                             ])
                         ]),
                         dbc.ListGroupItem([
@@ -193,10 +757,10 @@ def create_highlight_card(column: str, units: str, title: str):
                                 html.Center(html.Strong("Maximum"))
                             ]),       
                             dbc.ListGroup([
-                                html.Center(f"{pd.to_datetime(max_df['Date'].values[0]).date()}")
+                                html.Center(format_date(stats.maximum_date))
                             ]),  
                             dbc.ListGroup([                   
-                                html.Center(f"{int(max_df[column]):,} {units}")
+                                html.Center(format_value(stats.maximum))
                             ]),
                         ]),
                         dbc.ListGroupItem([
@@ -204,7 +768,7 @@ def create_highlight_card(column: str, units: str, title: str):
                                 html.Center(html.Strong("Mean"))
                             ]),                           
                             dbc.ListGroup([                   
-                                html.Center(f"{int(mean):,} {units}")
+                                html.Center(format_value(stats.mean))
                             ]),
                         ]),
                         dbc.ListGroupItem([
@@ -212,7 +776,7 @@ def create_highlight_card(column: str, units: str, title: str):
                                 html.Center(html.Strong("Median"))
                             ]),                         
                             dbc.ListGroup([                   
-                                html.Center(f"{int(median):,} {units}")
+                                html.Center(format_value(stats.median))
                             ]),
                         ]),
                         dbc.ListGroupItem([
@@ -220,7 +784,7 @@ def create_highlight_card(column: str, units: str, title: str):
                                 html.Center(html.Strong("Mode"))
                             ]),                        
                             dbc.ListGroup([                   
-                                html.Center(f"{int(mode):,} {units}")
+                                html.Center(format_value(stats.mode))
                             ]),
                         ])
                     ],